@@ -3,17 +3,32 @@ import zipfile
 import os
 import io
 from pptx import Presentation
-from pptx.enum.shapes import PP_PLACEHOLDER, MSO_SHAPE_TYPE
 import shutil
 from pptx.util import Inches
-import random
 from datetime import datetime, date
-from PIL import Image
-from PIL.ExifTags import TAGS
 import tempfile
 import base64
+import hashlib
+import time
+import json
+import csv
+import logging
 import streamlit.components.v1 as components
+from blob_store import BlobStore
+from checkpoint import CheckpointStore
+from result_cache import ResultCache
+import metrics
+from slide_engine import (
+    MANIFEST_NAMES, TEXT_FILL_OPTIONS, parse_config_date, rows_to_config, import_config_rows,
+    analyze_slide_placeholders, list_folder_images, load_folder_manifest, manifest_columns,
+    extract_archive, build_folder_slide, build_slides_parallel, merge_slides, save_presentation, ImageCache,
+    open_template, open_template_for_analysis
+)
+
 
+# st.fragment متاح منذ الإصدار 1.37 (experimental_fragment منذ 1.33)؛
+# في الإصدارات الأقدم تعمل الدوال كالمعتاد مع إعادة تشغيل الصفحة كاملة
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
 
 # إعداد صفحة Streamlit
 st.set_page_config(
@@ -25,8 +40,16 @@ st.set_page_config(
 # تهيئة session state
 if 'current_step' not in st.session_state:
     st.session_state.current_step = 1
-if 'pptx_data' not in st.session_state:
-    st.session_state.pptx_data = None
+if 'pptx_blob' not in st.session_state:
+    st.session_state.pptx_blob = None
+if 'pptx_name' not in st.session_state:
+    st.session_state.pptx_name = None
+if 'batch_templates' not in st.session_state:
+    st.session_state.batch_templates = []
+if 'output_blobs' not in st.session_state:
+    st.session_state.output_blobs = []
+if 'archive_blob' not in st.session_state:
+    st.session_state.archive_blob = None
 if 'slide_analysis' not in st.session_state:
     st.session_state.slide_analysis = None
 if 'placeholders_config' not in st.session_state:
@@ -35,6 +58,91 @@ if 'processing_details' not in st.session_state:
     st.session_state.processing_details = []
 if 'show_details_needed' not in st.session_state:
     st.session_state.show_details_needed = False
+if 'config_table' not in st.session_state:
+    st.session_state.config_table = {'rows': None, 'version': 0}
+
+logger = logging.getLogger('pptx_generator')
+
+CHECKPOINT_INTERVAL = float(os.environ.get('PPTX_CHECKPOINT_INTERVAL', 60))
+MAX_WORKERS = os.cpu_count() or 1
+DEFAULT_WORKERS = min(int(os.environ.get('PPTX_WORKERS', 1)), MAX_WORKERS)
+CONFIG_TABLE_COLUMNS = ('slot', 'kind', 'use', 'order', 'fill', 'value')
+
+@st.cache_resource
+def get_blob_store():
+    """مخزن الملفات المشترك بين جميع الجلسات (القوالب والملفات الناتجة)"""
+    root = os.environ.get(
+        'PPTX_BLOB_DIR',
+        os.path.join(tempfile.gettempdir(), 'pptx_generator_blobs')
+    )
+    ttl_seconds = int(os.environ.get('PPTX_BLOB_TTL', 6 * 60 * 60))
+    return BlobStore(root, ttl_seconds=ttl_seconds)
+
+@st.cache_resource
+def get_checkpoint_store():
+    """نقاط حفظ العمليات الطويلة (تبقى على القرص بعد إعادة تشغيل الخادم)"""
+    root = os.environ.get(
+        'PPTX_CHECKPOINT_DIR',
+        os.path.join(tempfile.gettempdir(), 'pptx_generator_checkpoints')
+    )
+    return CheckpointStore(root)
+
+@st.cache_resource
+def get_result_cache():
+    """العروض المولدة في الوضع الحتمي لإعادتها فوراً عند تكرار نفس العملية"""
+    root = os.environ.get(
+        'PPTX_RESULT_CACHE_DIR',
+        os.path.join(tempfile.gettempdir(), 'pptx_generator_results')
+    )
+    return ResultCache(root, ttl_seconds=float(os.environ.get('PPTX_RESULT_CACHE_TTL', 7 * 24 * 60 * 60)))
+
+@st.cache_resource
+def get_metrics_server():
+    """خادم مقاييس Prometheus على PPTX_METRICS_PORT (مرة واحدة لكل عملية خادم)"""
+    port = os.environ.get('PPTX_METRICS_PORT')
+    if not port:
+        return None
+    address = os.environ.get('PPTX_METRICS_ADDRESS', '127.0.0.1')
+    try:
+        return metrics.start_http_server(int(port), address)
+    except (OSError, ValueError) as e:
+        # المنفذ مستخدم (مثلاً عدة عمليات خادم على نفس الجهاز): يعمل التطبيق بدون خادم المقاييس
+        logger.warning("⚠ تعذر تشغيل خادم المقاييس على %s:%s: %s", address, port, e)
+        return None
+
+def publish_metrics():
+    """كتابة المقاييس إلى PPTX_METRICS_FILE إن حُدد (لـ textfile collector)"""
+    metrics_file = os.environ.get('PPTX_METRICS_FILE')
+    if metrics_file:
+        try:
+            metrics.REGISTRY.write_textfile(metrics_file)
+        except OSError:
+            pass
+
+def config_digest(placeholders_config):
+    """بصمة ثابتة للإعدادات لمطابقة العمليات ونقاط الحفظ"""
+    payload = json.dumps(placeholders_config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def set_session_blob(key, digest):
+    """حفظ بصمة ملف في الجلسة مع تحديث وقت استخدامه؛ الملفات السابقة تُحذف بانتهاء مدتها في المخزن"""
+    get_blob_store().touch(digest)
+    st.session_state[key] = digest
+
+def set_session_blobs(key, digests):
+    """حفظ قائمة بصمات في الجلسة (ملف لكل قالب)"""
+    for digest in digests:
+        get_blob_store().touch(digest)
+    st.session_state[key] = list(digests)
+
+def load_template():
+    """تحميل الشريحة الأولى من القالب (مع تخطيطها وقالبها الرئيسي فقط) للتحليل"""
+    store = get_blob_store()
+    digest = st.session_state.pptx_blob
+    if not store.exists(digest):
+        return None
+    with store.open(digest) as template_file:
+        return open_template_for_analysis(template_file)
 
 def add_detail(message, detail_type="info"):
     """إضافة تفصيل جديد إلى قائمة التفاصيل"""
@@ -65,91 +173,16 @@ def show_details_section():
                 else:
                     st.info(detail['message'])
 
-def analyze_slide_placeholders(prs):
-    """تحليل جميع placeholders في الشريحة الأولى مع ضبط الإحداثيات"""
-    if len(prs.slides) == 0:
-        return None
-    
-    first_slide = prs.slides[0]
-    slide_width = prs.slide_width
-    slide_height = prs.slide_height
-    
-    placeholders = {
-        'image_placeholders': [],
-        'text_placeholders': [],
-        'title_placeholders': [],
-        'slide_dimensions': {
-            'width': slide_width,
-            'height': slide_height,
-            'width_inches': slide_width / 914400,
-            'height_inches': slide_height / 914400
-        }
-    }
-    
-    placeholder_id = 0
-    def clamp_percent(val):
-        # تأكد أن القيمة بين 0 و 100 دائماً
-        return max(0, min(val, 100))
-    
-    for shape in first_slide.shapes:
-        if shape.is_placeholder:
-            placeholder_type = shape.placeholder_format.type
-            left_percent = clamp_percent((shape.left / slide_width) * 100)
-            top_percent = clamp_percent((shape.top / slide_height) * 100)
-            width_percent = clamp_percent((shape.width / slide_width) * 100)
-            height_percent = clamp_percent((shape.height / slide_height) * 100)
-            placeholder_info = {
-                'id': placeholder_id,
-                'type': placeholder_type,
-                'left': shape.left,
-                'top': shape.top,
-                'width': shape.width,
-                'height': shape.height,
-                'left_percent': left_percent,
-                'top_percent': top_percent,
-                'width_percent': width_percent,
-                'height_percent': height_percent,
-                'rotation': getattr(shape, 'rotation', 0)
-            }
-            if placeholder_type == PP_PLACEHOLDER.PICTURE:
-                placeholder_info['current_content'] = "صورة"
-                placeholders['image_placeholders'].append(placeholder_info)
-            elif placeholder_type == PP_PLACEHOLDER.TITLE:
-                placeholder_info['current_content'] = shape.text_frame.text if hasattr(shape, 'text_frame') and shape.text_frame.text else "العنوان"
-                placeholders['title_placeholders'].append(placeholder_info)
-            else:
-                if hasattr(shape, 'text_frame') and shape.text_frame:
-                    placeholder_info['current_content'] = shape.text_frame.text if shape.text_frame.text else f"نص {placeholder_id + 1}"
-                    placeholders['text_placeholders'].append(placeholder_info)
-            placeholder_id += 1
-    for shape in first_slide.shapes:
-        if shape.shape_type == MSO_SHAPE_TYPE.PICTURE and not shape.is_placeholder:
-            left_percent = clamp_percent((shape.left / slide_width) * 100)
-            top_percent = clamp_percent((shape.top / slide_height) * 100)
-            width_percent = clamp_percent((shape.width / slide_width) * 100)
-            height_percent = clamp_percent((shape.height / slide_height) * 100)
-            image_info = {
-                'id': placeholder_id,
-                'type': 'regular_image',
-                'left': shape.left,
-                'top': shape.top,
-                'width': shape.width,
-                'height': shape.height,
-                'left_percent': left_percent,
-                'top_percent': top_percent,
-                'width_percent': width_percent,
-                'height_percent': height_percent,
-                'rotation': getattr(shape, 'rotation', 0),
-                'current_content': "صورة موجودة"
-            }
-            placeholders['image_placeholders'].append(image_info)
-            placeholder_id += 1
-    return placeholders
-
 def render_slide_preview(slide_analysis):
     """عرض معاينة تفاعلية للشريحة مع رسم مربعات الـplaceholders أولاً ثم إطار الشريحة"""
     if not slide_analysis:
         return
+    html_code, height = build_slide_preview_html(slide_analysis)
+    components.html(html_code, height=height, scrolling=False)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_slide_preview_html(slide_analysis):
+    """بناء HTML المعاينة مرة واحدة لكل تحليل قالب"""
     dimensions = slide_analysis['slide_dimensions']
     max_width = 1024
     aspect_ratio = dimensions['width'] / dimensions['height']
@@ -286,119 +319,288 @@ def render_slide_preview(slide_analysis):
         {placeholder_html}
     </div>
     """
-    components.html(html_code, height=int(display_height)+60, scrolling=False)
+    return html_code, int(display_height) + 60
     
 def configure_image_placeholders(image_placeholders):
     """إعداد واجهة تكوين صور placeholders"""
+    config = st.session_state.placeholders_config.setdefault('images', {})
     if not image_placeholders:
         st.info("لا توجد مواضع صور في هذا القالب")
-        return {}
+        return config
     
     st.markdown("### 🖼️ إعدادات الصور")
     st.info(f"تم العثور على {len(image_placeholders)} موضع صورة في القالب")
     
-    config = {}
-    
+    max_order = max(20, len(image_placeholders))
     for i, placeholder in enumerate(image_placeholders):
-        with st.expander(f"🖼️ إعداد الصورة {i+1}", expanded=True):
-            col1, col2 = st.columns([2, 1])
+        configure_image_placeholder(i, placeholder, max_order)
+    
+    return config
+
+def widget_default(key, value):
+    """تهيئة قيمة الأداة من الإعدادات المحفوظة (مثلاً بعد المحرر الجدولي أو الاستيراد)"""
+    if key not in st.session_state:
+        st.session_state[key] = value
+
+def store_placeholder_config(section, slot, config):
+    """حفظ إعداد موضع واحد مع تحديث ملخص الإعدادات عند تغييره"""
+    changed = st.session_state.placeholders_config[section].get(slot) != config
+    st.session_state.placeholders_config[section][slot] = config
+    if changed:
+        refresh_config_summary()
+
+def refresh_config_summary():
+    """الملخص خارج أجزاء الإعداد (fragment) فلا يُعاد رسمه عند تغيير أحدها وحده؛
+    عند عرضه تُعاد الصفحة كاملة حتى لا يبقى الملخص قديماً"""
+    if st.session_state.get('show_config_summary') and not st.session_state.get('config_page_run'):
+        st.rerun()
+
+@fragment
+def configure_image_placeholder(i, placeholder, max_order):
+    """إعداد موضع صورة واحد؛ تغيير أدواته يعيد تشغيل هذا الجزء فقط"""
+    saved = st.session_state.placeholders_config['images'].get(f"image_{placeholder['id']}") or {}
+    with st.expander(f"🖼️ إعداد الصورة {i+1}", expanded=True):
+        col1, col2 = st.columns([2, 1])
+        
+        with col1:
+            widget_default(f"use_image_{placeholder['id']}", saved.get('use', True))
+            use_image = st.checkbox(
+                f"استبدال هذه الصورة",
+                key=f"use_image_{placeholder['id']}"
+            )
             
-            with col1:
-                use_image = st.checkbox(
-                    f"استبدال هذه الصورة",
-                    value=True,
-                    key=f"use_image_{placeholder['id']}"
+            if use_image:
+                widget_default(f"image_order_{placeholder['id']}", min(saved.get('order') or i+1, max_order))
+                image_order = st.number_input(
+                    f"ترتيب الصورة (1 = الصورة الأولى في كل مجلد)",
+                    min_value=1,
+                    max_value=max_order,
+                    key=f"image_order_{placeholder['id']}"
                 )
-                
-                if use_image:
-                    image_order = st.number_input(
-                        f"ترتيب الصورة (1 = الصورة الأولى في كل مجلد)",
-                        min_value=1,
-                        max_value=20,
-                        value=i+1,
-                        key=f"image_order_{placeholder['id']}"
-                    )
-                else:
-                    image_order = None
-            
-            with col2:
-                st.markdown(f"""
-                **معلومات الموضع:**
-                - العرض: {placeholder['width_percent']:.1f}%
-                - الارتفاع: {placeholder['height_percent']:.1f}%
-                - الموقع: ({placeholder['left_percent']:.1f}%, {placeholder['top_percent']:.1f}%)
-                """)
-            
-            config[f"image_{placeholder['id']}"] = {
-                'use': use_image,
-                'order': image_order,
-                'placeholder_info': placeholder
-            }
+            else:
+                image_order = None
+        
+        with col2:
+            st.markdown(f"""
+            **معلومات الموضع:**
+            - العرض: {placeholder['width_percent']:.1f}%
+            - الارتفاع: {placeholder['height_percent']:.1f}%
+            - الموقع: ({placeholder['left_percent']:.1f}%, {placeholder['top_percent']:.1f}%)
+            """)
     
-    return config
+    store_placeholder_config('images', f"image_{placeholder['id']}", {
+        'use': use_image,
+        'order': image_order,
+        'placeholder_info': placeholder
+    })
 
 def configure_text_placeholders(text_placeholders):
     """إعداد واجهة تكوين نص placeholders"""
+    config = st.session_state.placeholders_config.setdefault('texts', {})
     if not text_placeholders:
         st.info("لا توجد مواضع نصوص في هذا القالب")
-        return {}
+        return config
     
     st.markdown("### 📝 إعدادات النصوص")
     st.info(f"تم العثور على {len(text_placeholders)} موضع نص في القالب")
     
-    config = {}
-    
     for i, placeholder in enumerate(text_placeholders):
-        with st.expander(f"📝 إعداد النص {i+1}: {placeholder['current_content']}", expanded=True):
-            
-            fill_option = st.radio(
-                f"كيف تريد ملء هذا النص؟",
-                ("ترك فارغ", "نص ثابت", "تاريخ", "تاريخ الصورة", "اسم المجلد"),
-                key=f"text_fill_option_{placeholder['id']}",
-                index=0
+        configure_text_placeholder(i, placeholder)
+    
+    return config
+
+@fragment
+def configure_text_placeholder(i, placeholder):
+    """إعداد موضع نص واحد؛ تغيير أدواته يعيد تشغيل هذا الجزء فقط"""
+    saved = st.session_state.placeholders_config['texts'].get(f"text_{placeholder['id']}") or {}
+    saved_value = saved.get('value') or ''
+    with st.expander(f"📝 إعداد النص {i+1}: {placeholder['current_content']}", expanded=True):
+        
+        widget_default(f"text_fill_option_{placeholder['id']}", saved.get('type', TEXT_FILL_OPTIONS[0]))
+        fill_option = st.radio(
+            f"كيف تريد ملء هذا النص؟",
+            TEXT_FILL_OPTIONS,
+            key=f"text_fill_option_{placeholder['id']}"
+        )
+        
+        placeholder_config = {
+            'type': fill_option,
+            'value': None
+        }
+        
+        if fill_option == "نص ثابت":
+            widget_default(f"custom_text_{placeholder['id']}", saved_value if saved.get('type') == "نص ثابت" else "")
+            custom_text = st.text_input(
+                "أدخل النص المطلوب:",
+                key=f"custom_text_{placeholder['id']}",
+                placeholder="مثال: اسم المشروع، اسم الشركة، إلخ..."
             )
+            placeholder_config['value'] = custom_text
             
-            placeholder_config = {
-                'type': fill_option,
-                'value': None
-            }
+        elif fill_option == "تاريخ":
+            saved_date = parse_config_date(saved_value) if saved.get('type') == "تاريخ" else None
+            widget_default(f"date_option_{placeholder['id']}", "تاريخ مخصص" if saved_date else "تاريخ اليوم")
+            date_option = st.radio(
+                "اختر نوع التاريخ:",
+                ("تاريخ اليوم", "تاريخ مخصص"),
+                key=f"date_option_{placeholder['id']}"
+            )
             
-            if fill_option == "نص ثابت":
-                custom_text = st.text_input(
-                    "أدخل النص المطلوب:",
-                    key=f"custom_text_{placeholder['id']}",
-                    placeholder="مثال: اسم المشروع، اسم الشركة، إلخ..."
-                )
-                placeholder_config['value'] = custom_text
-                
-            elif fill_option == "تاريخ":
-                date_option = st.radio(
-                    "اختر نوع التاريخ:",
-                    ("تاريخ اليوم", "تاريخ مخصص"),
-                    key=f"date_option_{placeholder['id']}"
+            if date_option == "تاريخ اليوم":
+                placeholder_config['value'] = "today"
+            else:
+                widget_default(f"custom_date_{placeholder['id']}", saved_date or date.today())
+                custom_date = st.date_input(
+                    "اختر التاريخ:",
+                    key=f"custom_date_{placeholder['id']}"
                 )
+                placeholder_config['value'] = custom_date.strftime('%Y-%m-%d')
                 
-                if date_option == "تاريخ اليوم":
-                    placeholder_config['value'] = "today"
-                else:
-                    custom_date = st.date_input(
-                        "اختر التاريخ:",
-                        key=f"custom_date_{placeholder['id']}",
-                        value=date.today()
-                    )
-                    placeholder_config['value'] = custom_date.strftime('%Y-%m-%d')
-                    
-            elif fill_option == "تاريخ الصورة":
-                placeholder_config['value'] = "image_date"
-                st.info("سيتم استخدام تاريخ التقاط الصورة الأولى في كل مجلد")
-                
-            elif fill_option == "اسم المجلد":
-                placeholder_config['value'] = "folder_name"
-                st.info("سيتم استخدام اسم المجلد كنص")
+        elif fill_option == "تاريخ الصورة":
+            placeholder_config['value'] = "image_date"
+            st.info("سيتم استخدام تاريخ التقاط الصورة الأولى في كل مجلد")
             
-            config[f"text_{placeholder['id']}"] = placeholder_config
+        elif fill_option == "اسم المجلد":
+            placeholder_config['value'] = "folder_name"
+            st.info("سيتم استخدام اسم المجلد كنص")
+            
+        elif fill_option == "من ملف البيانات":
+            widget_default(f"manifest_column_{placeholder['id']}", saved_value if saved.get('type') == "من ملف البيانات" else "")
+            manifest_column = st.text_input(
+                "اسم العمود في ملف البيانات:",
+                key=f"manifest_column_{placeholder['id']}",
+                placeholder="مثال: date، site، inspector"
+            )
+            placeholder_config['value'] = manifest_column.strip()
+            st.info(f"سيتم أخذ القيمة من ملف {' أو '.join(MANIFEST_NAMES)} داخل ملف ZIP حسب اسم المجلد")
+        
+        store_placeholder_config('texts', f"text_{placeholder['id']}", placeholder_config)
+
+def config_to_rows(slide_analysis, placeholders_config):
+    """تحويل الإعدادات إلى صفوف جدول مختصرة (صف لكل موضع)"""
+    image_config = placeholders_config.get('images', {})
+    text_config = placeholders_config.get('texts', {})
+    rows = []
     
-    return config
+    for i, placeholder in enumerate(slide_analysis['image_placeholders']):
+        slot = f"image_{placeholder['id']}"
+        saved = image_config.get(slot) or {}
+        rows.append({
+            'slot': slot,
+            'label': f"🖼️ صورة {i+1} ({placeholder['left_percent']:.0f}%, {placeholder['top_percent']:.0f}%)",
+            'kind': 'image',
+            'use': saved.get('use', True),
+            'order': saved.get('order') or i+1,
+            'fill': None,
+            'value': None
+        })
+    
+    for i, placeholder in enumerate(slide_analysis['text_placeholders']):
+        slot = f"text_{placeholder['id']}"
+        saved = text_config.get(slot) or {}
+        fill = saved.get('type', TEXT_FILL_OPTIONS[0])
+        value = saved.get('value')
+        rows.append({
+            'slot': slot,
+            'label': f"📝 نص {i+1}: {placeholder['current_content']}",
+            'kind': 'text',
+            'use': fill != "ترك فارغ",
+            'order': None,
+            'fill': fill,
+            'value': value if fill in ("نص ثابت", "تاريخ", "من ملف البيانات") else None
+        })
+    
+    return rows
+
+def export_config_rows(rows, file_format):
+    """تصدير الإعدادات المختصرة بصيغة json أو csv"""
+    compact = [{column: row.get(column) for column in CONFIG_TABLE_COLUMNS} for row in rows]
+    if file_format == 'json':
+        return json.dumps(compact, ensure_ascii=False, indent=2).encode('utf-8')
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CONFIG_TABLE_COLUMNS)
+    writer.writeheader()
+    writer.writerows(compact)
+    return output.getvalue().encode('utf-8-sig')
+
+def reset_config_table():
+    """إعادة بناء صفوف المحرر الجدولي من الإعدادات الحالية"""
+    st.session_state.config_table = {
+        'rows': None,
+        'version': st.session_state.config_table['version'] + 1
+    }
+
+@fragment
+def configure_placeholders_table(analysis):
+    """محرر جدولي واحد لجميع المواضع بدلاً من مئات الأدوات في القوالب الكبيرة"""
+    st.markdown("### 🧮 محرر الإعدادات الجدولي")
+    table = st.session_state.config_table
+    if table['rows'] is None:
+        table['rows'] = config_to_rows(analysis, st.session_state.placeholders_config)
+    
+    edited_rows = st.data_editor(
+        table['rows'],
+        key=f"config_table_{table['version']}",
+        hide_index=True,
+        num_rows="fixed",
+        disabled=('slot', 'label', 'kind'),
+        column_order=('label', 'use', 'order', 'fill', 'value'),
+        column_config={
+            'label': st.column_config.TextColumn("الموضع"),
+            'use': st.column_config.CheckboxColumn("استخدام"),
+            'order': st.column_config.NumberColumn("ترتيب الصورة", min_value=1, step=1),
+            'fill': st.column_config.SelectboxColumn("نوع النص", options=TEXT_FILL_OPTIONS),
+            'value': st.column_config.TextColumn("القيمة (نص ثابت أو تاريخ YYYY-MM-DD)")
+        }
+    )
+    placeholders_config = rows_to_config(analysis, edited_rows)
+    if placeholders_config != st.session_state.placeholders_config:
+        st.session_state.placeholders_config = placeholders_config
+        refresh_config_summary()
+    
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        config_file = st.file_uploader(
+            "استيراد إعدادات (JSON/CSV)",
+            type=["json", "csv"],
+            key=f"config_import_{table['version']}"
+        )
+        if config_file and st.button("📥 تطبيق الإعدادات المستوردة"):
+            try:
+                imported = import_config_rows(config_file.getvalue(), config_file.name)
+                known_slots = {row['slot'] for row in table['rows']}
+                unknown = [row['slot'] for row in imported if row['slot'] not in known_slots]
+                current = {row['slot']: dict(row) for row in edited_rows}
+                for row in imported:
+                    if row['slot'] in current:
+                        current[row['slot']].update({
+                            column: row[column] for column in ('use', 'order', 'fill', 'value') if column in row
+                        })
+                st.session_state.placeholders_config = rows_to_config(analysis, list(current.values()))
+                reset_config_table()
+                if unknown:
+                    st.session_state.config_import_warning = f"⚠️ مواضع غير موجودة في القالب تم تجاهلها: {', '.join(unknown)}"
+                st.rerun()
+            except (ValueError, UnicodeDecodeError) as e:
+                st.error(f"❌ ملف إعدادات غير صالح: {e}")
+        if st.session_state.get('config_import_warning'):
+            st.warning(st.session_state.pop('config_import_warning'))
+    
+    export_rows = config_to_rows(analysis, st.session_state.placeholders_config)
+    with col2:
+        st.download_button(
+            "⬇️ تصدير JSON",
+            data=export_config_rows(export_rows, 'json'),
+            file_name="placeholders_config.json",
+            mime="application/json"
+        )
+    with col3:
+        st.download_button(
+            "⬇️ تصدير CSV",
+            data=export_config_rows(export_rows, 'csv'),
+            file_name="placeholders_config.csv",
+            mime="text/csv"
+        )
 
 def step1_upload_pptx():
     """الخطوة الأولى: رفع ملف PowerPoint"""
@@ -408,6 +610,11 @@ def step1_upload_pptx():
     st.markdown("### 📂 الخطوة 1: رفع ملف PowerPoint")
     st.info("ارفع ملف PowerPoint (.pptx) لتحليل القالب وإعداد الخيارات")
     
+    if st.session_state.batch_templates:
+        names = "، ".join(template['name'] for template in st.session_state.batch_templates)
+        st.success(f"📚 قوالب في الدفعة ({len(st.session_state.batch_templates)}): {names} — "
+                   f"سيُولد عرض لكل قالب من نفس ملف الصور")
+    
     uploaded_pptx = st.file_uploader(
         "اختر ملف PowerPoint (.pptx)", 
         type=["pptx"], 
@@ -419,15 +626,19 @@ def step1_upload_pptx():
         if st.button("📊 تحليل القالب والمتابعة", type="primary"):
             with st.spinner("🔍 جاري تحليل ملف PowerPoint..."):
                 try:
-                    # حفظ بيانات الملف
-                    st.session_state.pptx_data = uploaded_pptx.read()
+                    # حفظ الملف في المخزن المشترك والاحتفاظ ببصمته فقط
+                    set_session_blob('pptx_blob', get_blob_store().put_file(uploaded_pptx))
+                    st.session_state.pptx_name = uploaded_pptx.name
+                    metrics.BYTES_INGESTED.labels(kind='template').inc(uploaded_pptx.size)
                     
                     # تحليل الشريحة
-                    prs = Presentation(io.BytesIO(st.session_state.pptx_data))
+                    prs = load_template()
                     slide_analysis = analyze_slide_placeholders(prs)
                     
                     if slide_analysis:
                         st.session_state.slide_analysis = slide_analysis
+                        st.session_state.placeholders_config = {}
+                        reset_config_table()
                         st.session_state.current_step = 2
                         st.rerun()
                     else:
@@ -453,9 +664,28 @@ def step1_upload_pptx():
 
         #### **الخطوة 3: رفع الصور والمعالجة**
         - ارفع ملف ZIP يحتوي على مجلدات الصور
+        - (اختياري) ضع ملف manifest.csv أو manifest.json في جذر ملف ZIP يحتوي على عمود folder باسم كل مجلد وأعمدة أخرى (تاريخ، موقع، ...) يمكن ربطها بالنصوص
         - ابدأ المعالجة وفقاً للإعدادات المحددة
         """)
 
+def add_current_template_to_batch():
+    """نقل القالب الحالي وإعداداته إلى قائمة الدفعة (ملفه يبقى في المخزن)"""
+    st.session_state.batch_templates.append({
+        'name': st.session_state.pptx_name or "template.pptx",
+        'template_hash': st.session_state.pptx_blob,
+        'slide_analysis': st.session_state.slide_analysis,
+        'placeholders_config': st.session_state.placeholders_config
+    })
+    set_session_blob('pptx_blob', None)
+    st.session_state.pptx_name = None
+    st.session_state.slide_analysis = None
+    st.session_state.placeholders_config = {}
+    reset_config_table()
+
+def remove_batch_template(index):
+    """حذف قالب من الدفعة"""
+    st.session_state.batch_templates.pop(index)
+
 def step2_configure_placeholders():
     """الخطوة الثانية: إعداد placeholders"""
     st.title("⚙️ إعداد Placeholders")
@@ -468,6 +698,12 @@ def step2_configure_placeholders():
             st.session_state.current_step = 1
             st.rerun()
     
+    with col2:
+        if st.button("➕ إضافة قالب آخر للدفعة", help="حفظ هذا القالب وإعداداته ورفع قالب آخر يُولد من نفس ملف الصور"):
+            add_current_template_to_batch()
+            st.session_state.current_step = 1
+            st.rerun()
+    
     with col3:
         if st.button("➡️ المتابعة للمعالجة", type="primary"):
             st.session_state.current_step = 3
@@ -477,229 +713,128 @@ def step2_configure_placeholders():
     
     # عرض معاينة الشريحة
     if st.session_state.slide_analysis:
-        render_slide_preview(st.session_state.slide_analysis)
-        
-        # إحصائيات سريعة بخلفية وألوان مميزة
         analysis = st.session_state.slide_analysis
-        stats_html = f"""
-        <div style="
-            margin: 15px 0; 
-            display: flex; 
-            gap: 24px;
-            justify-content: center;
-        ">
-            <div style="
-                background: linear-gradient(135deg, #ffe6e6 0%, #ffd6d6 100%);
-                border-radius: 12px; 
-                padding: 20px 35px; 
-                box-shadow: 0 3px 8px rgba(255,107,107,0.08); 
-                text-align: center;
-                min-width: 140px;
-                border: 2px solid #ff6b6b;">
-                <span style="font-size:32px;">🖼️</span>
-                <div style="font-size:22px; font-weight:bold; color:#ff6b6b;">{len(analysis['image_placeholders'])}</div>
-                <div style="font-size:15px; color:#ff6b6b;">مواضع الصور</div>
-            </div>
-            <div style="
-                background: linear-gradient(135deg, #e6fff9 0%, #d6fff6 100%);
-                border-radius: 12px; 
-                padding: 20px 35px; 
-                box-shadow: 0 3px 8px rgba(78,205,196,0.08); 
-                text-align: center;
-                min-width: 140px;
-                border: 2px solid #4ecdc4;">
-                <span style="font-size:32px;">📝</span>
-                <div style="font-size:22px; font-weight:bold; color:#4ecdc4;">{len(analysis['text_placeholders'])}</div>
-                <div style="font-size:15px; color:#4ecdc4;">مواضع النصوص</div>
-            </div>
-            <div style="
-                background: linear-gradient(135deg, #e6f7ff 0%, #d6eaff 100%);
-                border-radius: 12px; 
-                padding: 20px 35px; 
-                box-shadow: 0 3px 8px rgba(69,183,209,0.08); 
-                text-align: center;
-                min-width: 140px;
-                border: 2px solid #45b7d1;">
-                <span style="font-size:32px;">📋</span>
-                <div style="font-size:22px; font-weight:bold; color:#45b7d1;">{len(analysis['title_placeholders'])}</div>
-                <div style="font-size:15px; color:#45b7d1;">العناوين</div>
-            </div>
-        </div>
-        """
-        st.markdown(stats_html, unsafe_allow_html=True)
-        
-        st.markdown("---")
-        
-        # إعداد الصور
-        image_config = configure_image_placeholders(analysis['image_placeholders'])
-        st.session_state.placeholders_config['images'] = image_config
+        render_template_overview(analysis)
         
         st.markdown("---")
         
-        # إعداد النصوص
-        text_config = configure_text_placeholders(analysis['text_placeholders'])
-        st.session_state.placeholders_config['texts'] = text_config
-        
-        # معاينة الإعدادات
-        if st.checkbox("📋 عرض ملخص الإعدادات", value=False):
-            st.markdown("### 📋 ملخص الإعدادات الحالية")
-            
-            # ملخص الصور
-            if image_config:
-                st.markdown("#### 🖼️ إعدادات الصور:")
-                for key, config in image_config.items():
-                    if config['use']:
-                        st.success(f"✅ صورة {config['order']}: سيتم استبدالها بالصورة رقم {config['order']} من كل مجلد")
-                    else:
-                        st.info(f"⏭️ صورة: لن يتم استبدالها")
-            
-            # ملخص النصوص
-            if text_config:
-                st.markdown("#### 📝 إعدادات النصوص:")
-                for key, config in text_config.items():
-                    if config['type'] == 'ترك فارغ':
-                        st.info(f"⏭️ نص: سيترك فارغاً")
-                    elif config['type'] == 'نص ثابت':
-                        st.success(f"✅ نص ثابت: '{config['value']}'")
-                    elif config['type'] == 'تاريخ':
-                        st.success(f"📅 تاريخ: {config['value']}")
-                    elif config['type'] == 'تاريخ الصورة':
-                        st.success(f"📸 تاريخ الصورة: سيتم استخراجه من metadata")
-                    elif config['type'] == 'اسم المجلد':
-                        st.success(f"📁 اسم المجلد: سيتم استخدام اسم كل مجلد")
-
-# باقي الكود كما هو (لا تغيره)
-def get_image_date(image_path):
-    """استخراج تاريخ التقاط الصورة من metadata"""
-    try:
-        with Image.open(image_path) as img:
-            exifdata = img.getexif()
-            for tag_id in exifdata:
-                tag = TAGS.get(tag_id, tag_id)
-                data = exifdata.get(tag_id)
-                
-                if tag in ['DateTime', 'DateTimeOriginal', 'DateTimeDigitized']:
-                    try:
-                        date_obj = datetime.strptime(str(data), '%Y:%m:%d %H:%M:%S')
-                        return date_obj.strftime('%Y-%m-%d')
-                    except:
-                        continue
+        # القوالب الكبيرة تُعد افتراضياً عبر المحرر الجدولي
+        slots_count = len(analysis['image_placeholders']) + len(analysis['text_placeholders'])
+        config_mode = st.radio(
+            "طريقة الإعداد:",
+            ("إعداد تفصيلي", "محرر جدولي"),
+            index=1 if slots_count > 12 else 0,
+            horizontal=True,
+            key="config_mode",
+            on_change=reset_config_table
+        )
         
-        timestamp = os.path.getmtime(image_path)
-        return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
-    except:
-        return datetime.now().strftime('%Y-%m-%d')
-
-def apply_configured_placeholders(slide, folder_path, folder_name, slide_analysis, placeholders_config):
-    """تطبيق الإعدادات المحددة على الشريحة"""
-    
-    # الحصول على قائمة الصور في المجلد
-    imgs = [f for f in os.listdir(folder_path) 
-            if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp'))]
-    imgs.sort()
-    
-    # تطبيق إعدادات الصور
-    image_config = placeholders_config.get('images', {})
-    
-    # إنشاء قاموس للصور حسب الترتيب المطلوب
-    image_assignments = {}
-    for config_key, config in image_config.items():
-        if config['use'] and config['order'] and config['order'] <= len(imgs):
-            image_path = os.path.join(folder_path, imgs[config['order'] - 1])
-            placeholder_info = config['placeholder_info']
-            
-            # العثور على الشكل المقابل في الشريحة الجديدة
-            target_shapes = []
-            for shape in slide.shapes:
-                if shape.is_placeholder and shape.placeholder_format.type == PP_PLACEHOLDER.PICTURE:
-                    target_shapes.append(shape)
-                elif shape.shape_type == MSO_SHAPE_TYPE.PICTURE and not shape.is_placeholder:
-                    target_shapes.append(shape)
-            
-            # مطابقة الشكل بناءً على الموقع
-            for shape in target_shapes:
-                shape_left_percent = (shape.left / slide_analysis['slide_dimensions']['width']) * 100
-                shape_top_percent = (shape.top / slide_analysis['slide_dimensions']['height']) * 100
-                
-                # تحمل اختلاف بسيط في الموقع
-                if (abs(shape_left_percent - placeholder_info['left_percent']) < 5 and 
-                    abs(shape_top_percent - placeholder_info['top_percent']) < 5):
-                    
-                    try:
-                        if shape.is_placeholder:
-                            with open(image_path, 'rb') as img_file:
-                                shape.insert_picture(img_file)
-                        else:
-                            # استبدال الصورة العادية
-                            original_left = shape.left
-                            original_top = shape.top
-                            original_width = shape.width
-                            original_height = shape.height
-                            
-                            shape_element = shape._element
-                            shape_element.getparent().remove(shape_element)
-                            
-                            slide.shapes.add_picture(image_path, original_left, original_top, original_width, original_height)
-                        
-                        add_detail(f"✅ تم استبدال الصورة {config['order']}: {os.path.basename(image_path)}", "success")
-                        break
-                    except Exception as e:
-                        add_detail(f"❌ فشل في استبدال الصورة: {e}", "error")
-    
-    # تطبيق إعدادات النصوص
-    text_config = placeholders_config.get('texts', {})
-    
-    text_shapes = []
-    for shape in slide.shapes:
-        if (shape.is_placeholder and 
-            shape.placeholder_format.type not in [PP_PLACEHOLDER.PICTURE, PP_PLACEHOLDER.TITLE] and
-            hasattr(shape, 'text_frame') and shape.text_frame):
-            text_shapes.append(shape)
-    
-    text_index = 0
-    for config_key, config in text_config.items():
-        if text_index < len(text_shapes):
-            shape = text_shapes[text_index]
-            
-            try:
-                if config['type'] == "ترك فارغ":
-                    shape.text_frame.text = ""
-                    
-                elif config['type'] == "نص ثابت":
-                    if config['value']:
-                        shape.text_frame.text = config['value']
-                        
-                elif config['type'] == "تاريخ":
-                    if config['value'] == "today":
-                        date_text = datetime.now().strftime('%Y-%m-%d')
-                    else:
-                        date_text = config['value']
-                    shape.text_frame.text = date_text
-                    
-                elif config['type'] == "تاريخ الصورة" and imgs:
-                    first_image_path = os.path.join(folder_path, imgs[0])
-                    image_date = get_image_date(first_image_path)
-                    shape.text_frame.text = image_date
-                    
-                elif config['type'] == "اسم المجلد":
-                    shape.text_frame.text = folder_name
+        # أثناء تشغيل الصفحة كاملة يُرسم الملخص بعد الإعدادات فلا داعي لإعادة التشغيل
+        st.session_state.config_page_run = True
+        try:
+            if config_mode == "محرر جدولي":
+                configure_placeholders_table(analysis)
+            else:
+                # إعداد الصور
+                configure_image_placeholders(analysis['image_placeholders'])
                 
-                add_detail(f"✅ تم تطبيق النص: {config['type']}", "success")
+                st.markdown("---")
                 
-            except Exception as e:
-                add_detail(f"⚠ خطأ في تطبيق النص: {e}", "warning")
+                # إعداد النصوص
+                configure_text_placeholders(analysis['text_placeholders'])
             
-            text_index += 1
+            # معاينة الإعدادات
+            render_config_summary()
+        finally:
+            st.session_state.config_page_run = False
+
+@fragment
+def render_template_overview(analysis):
+    """معاينة الشريحة والإحصائيات؛ لا يعاد رسمها عند تغيير إعداد موضع واحد"""
+    render_slide_preview(analysis)
     
-    # تطبيق العنوان (اسم المجلد)
-    title_shapes = [
-        shape for shape in slide.shapes
-        if shape.is_placeholder and shape.placeholder_format.type == PP_PLACEHOLDER.TITLE
-    ]
+    # إحصائيات سريعة بخلفية وألوان مميزة
+    stats_html = f"""
+    <div style="
+        margin: 15px 0; 
+        display: flex; 
+        gap: 24px;
+        justify-content: center;
+    ">
+        <div style="
+            background: linear-gradient(135deg, #ffe6e6 0%, #ffd6d6 100%);
+            border-radius: 12px; 
+            padding: 20px 35px; 
+            box-shadow: 0 3px 8px rgba(255,107,107,0.08); 
+            text-align: center;
+            min-width: 140px;
+            border: 2px solid #ff6b6b;">
+            <span style="font-size:32px;">🖼️</span>
+            <div style="font-size:22px; font-weight:bold; color:#ff6b6b;">{len(analysis['image_placeholders'])}</div>
+            <div style="font-size:15px; color:#ff6b6b;">مواضع الصور</div>
+        </div>
+        <div style="
+            background: linear-gradient(135deg, #e6fff9 0%, #d6fff6 100%);
+            border-radius: 12px; 
+            padding: 20px 35px; 
+            box-shadow: 0 3px 8px rgba(78,205,196,0.08); 
+            text-align: center;
+            min-width: 140px;
+            border: 2px solid #4ecdc4;">
+            <span style="font-size:32px;">📝</span>
+            <div style="font-size:22px; font-weight:bold; color:#4ecdc4;">{len(analysis['text_placeholders'])}</div>
+            <div style="font-size:15px; color:#4ecdc4;">مواضع النصوص</div>
+        </div>
+        <div style="
+            background: linear-gradient(135deg, #e6f7ff 0%, #d6eaff 100%);
+            border-radius: 12px; 
+            padding: 20px 35px; 
+            box-shadow: 0 3px 8px rgba(69,183,209,0.08); 
+            text-align: center;
+            min-width: 140px;
+            border: 2px solid #45b7d1;">
+            <span style="font-size:32px;">📋</span>
+            <div style="font-size:22px; font-weight:bold; color:#45b7d1;">{len(analysis['title_placeholders'])}</div>
+            <div style="font-size:15px; color:#45b7d1;">العناوين</div>
+        </div>
+    </div>
+    """
+    st.markdown(stats_html, unsafe_allow_html=True)
+
+@fragment
+def render_config_summary():
+    """ملخص الإعدادات الحالية كما هي محفوظة في session state"""
+    image_config = st.session_state.placeholders_config.get('images', {})
+    text_config = st.session_state.placeholders_config.get('texts', {})
     
-    if title_shapes:
-        title_shapes[0].text = folder_name
-        add_detail(f"✅ تم تحديث العنوان: {folder_name}", "success")
+    if st.checkbox("📋 عرض ملخص الإعدادات", key="show_config_summary"):
+        st.markdown("### 📋 ملخص الإعدادات الحالية")
+        
+        # ملخص الصور
+        if image_config:
+            st.markdown("#### 🖼️ إعدادات الصور:")
+            for key, config in image_config.items():
+                if config['use']:
+                    st.success(f"✅ صورة {config['order']}: سيتم استبدالها بالصورة رقم {config['order']} من كل مجلد")
+                else:
+                    st.info(f"⏭️ صورة: لن يتم استبدالها")
+        
+        # ملخص النصوص
+        if text_config:
+            st.markdown("#### 📝 إعدادات النصوص:")
+            for key, config in text_config.items():
+                if config['type'] == 'ترك فارغ':
+                    st.info(f"⏭️ نص: سيترك فارغاً")
+                elif config['type'] == 'نص ثابت':
+                    st.success(f"✅ نص ثابت: '{config['value']}'")
+                elif config['type'] == 'تاريخ':
+                    st.success(f"📅 تاريخ: {config['value']}")
+                elif config['type'] == 'تاريخ الصورة':
+                    st.success(f"📸 تاريخ الصورة: سيتم استخراجه من metadata")
+                elif config['type'] == 'اسم المجلد':
+                    st.success(f"📁 اسم المجلد: سيتم استخدام اسم كل مجلد")
+                elif config['type'] == 'من ملف البيانات':
+                    st.success(f"🗂️ من ملف البيانات: العمود '{config['value']}'")
 
 def step3_process_files():
     """الخطوة الثالثة: رفع الصور ومعالجة الملفات"""
@@ -713,6 +848,19 @@ def step3_process_files():
             st.session_state.current_step = 2
             st.rerun()
     
+    if st.session_state.batch_templates:
+        st.markdown("### 📚 قوالب الدفعة")
+        st.caption("تُقرأ الصور وتُعالج مرة واحدة لجميع القوالب، ويُولد عرض مستقل لكل قالب")
+        for index, template in enumerate(st.session_state.batch_templates):
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.info(f"📄 {template['name']}")
+            with col2:
+                if st.button("🗑️ إزالة", key=f"remove_batch_{index}"):
+                    remove_batch_template(index)
+                    st.rerun()
+        st.info(f"📄 {st.session_state.pptx_name or 'template.pptx'} (القالب الحالي)")
+    
     st.markdown("### 📂 رفع ملف الصور")
     
     uploaded_zip = st.file_uploader(
@@ -774,163 +922,526 @@ def step3_process_files():
             value=True,
             help="تجاهل المجلدات التي لا تحتوي على صور"
         )
+        
+        workers = st.number_input(
+            "عدد العمليات المتوازية:",
+            min_value=1,
+            max_value=MAX_WORKERS,
+            value=DEFAULT_WORKERS,
+            help="توزيع إنشاء الشرائح على عدة أنوية معالج؛ الناتج مطابق للمعالجة المتسلسلة"
+        )
+    
+    with col1:
+        deterministic = st.checkbox(
+            "ناتج ثابت (إعادة النتيجة المحفوظة عند التكرار)",
+            value=True,
+            key="deterministic_output",
+            help="نفس القالب والصور والإعدادات تعطي نفس الملف تماماً، ويُعاد الملف المحفوظ فوراً دون إعادة المعالجة"
+        )
+        
+        include_template_slides = st.checkbox(
+            "تضمين شرائح القالب في الملف الناتج",
+            value=True,
+            help="عند إلغاء التحديد يحتوي الملف الناتج على الشرائح الجديدة فقط، ولا تُقرأ شرائح القالب ووسائطها أثناء التوليد"
+        )
+        
+        shuffle_seed = 0
+        if deterministic and image_order_option == "عشوائي":
+            shuffle_seed = st.number_input(
+                "بذرة الترتيب العشوائي:",
+                min_value=0,
+                value=0,
+                help="نفس البذرة تعطي نفس الترتيب العشوائي؛ غيّرها للحصول على ترتيب مختلف"
+            )
     
     if uploaded_zip:
         if st.button("🚀 بدء المعالجة", type="primary"):
-            clear_details()
+            # حفظ ملف الصور في المخزن المشترك حتى يمكن استئناف العملية دون إعادة رفعه
+            set_session_blob('archive_blob', get_blob_store().put_file(uploaded_zip))
+            metrics.BYTES_INGESTED.labels(kind='archive').inc(uploaded_zip.size)
+            run_generation(st.session_state.archive_blob, image_order_option, skip_empty_folders, workers,
+                           deterministic, shuffle_seed, include_template_slides)
+            return
+    
+    show_resumable_jobs(workers)
+
+def show_resumable_jobs(workers=1):
+    """عرض العمليات المنقطعة لنفس القالب والإعدادات مع خيار الاستئناف"""
+    pending_jobs = get_checkpoint_store().pending(
+        template_hash=st.session_state.pptx_blob,
+        config_hash=config_digest(st.session_state.placeholders_config)
+    )
+    if not pending_jobs:
+        return
+    
+    store = get_blob_store()
+    resume_job = None
+    st.markdown("### ⏯️ عمليات غير مكتملة")
+    for job in pending_jobs:
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            updated_at = datetime.fromtimestamp(job['updated_at']).strftime('%Y-%m-%d %H:%M')
+            st.info(f"📦 {job['next_folder']}/{job['total_folders']} مجلد مكتمل — آخر حفظ {updated_at}")
+        with col2:
+            if store.exists(job['archive_hash']):
+                if st.button("▶️ استئناف", key=f"resume_{job['job_key']}", type="primary"):
+                    resume_job = job
+            else:
+                st.caption("أعد رفع نفس ملف ZIP للاستئناف")
+        with col3:
+            if st.button("🗑️ حذف", key=f"discard_{job['job_key']}"):
+                get_checkpoint_store().discard(job['job_key'])
+                st.rerun()
+    
+    if resume_job:
+        set_session_blob('archive_blob', resume_job['archive_hash'])
+        run_generation(resume_job['archive_hash'], resume_job['image_order_option'], resume_job['skip_empty_folders'], workers,
+                       resume_job.get('deterministic', False), resume_job.get('shuffle_seed', 0),
+                       resume_job.get('include_template_slides', True))
+
+def generation_targets():
+    """القوالب المطلوب توليدها: قوالب الدفعة المحفوظة ثم القالب الحالي"""
+    current = {
+        'name': st.session_state.pptx_name or "template.pptx",
+        'template_hash': st.session_state.pptx_blob,
+        'slide_analysis': st.session_state.slide_analysis,
+        'placeholders_config': st.session_state.placeholders_config
+    }
+    return [dict(target) for target in st.session_state.batch_templates] + [current]
+
+def generation_job(target, archive_digest, image_order_option, skip_empty_folders, deterministic, shuffle_seed,
+                   include_template_slides=True):
+    """حالة العملية ومفتاح نقطة الحفظ ومفتاح النتيجة المحفوظة: نفس القالب والصور والإعدادات والخيارات = نفس المفتاح"""
+    placeholders_config = target['placeholders_config']
+    job_state = {
+        'template_hash': target['template_hash'],
+        'archive_hash': archive_digest,
+        'config_hash': config_digest(placeholders_config),
+        'image_order_option': image_order_option,
+        'skip_empty_folders': skip_empty_folders,
+        'deterministic': deterministic,
+        'shuffle_seed': shuffle_seed,
+        'include_template_slides': include_template_slides
+    }
+    options = [image_order_option, skip_empty_folders]
+    if not include_template_slides:
+        options.append('without_template_slides')
+    if deterministic:
+        options += ['deterministic', shuffle_seed]
+    job_key = CheckpointStore.job_key(
+        job_state['template_hash'], job_state['archive_hash'], job_state['config_hash'], options
+    )
+    cache_key = job_key
+    # نص "تاريخ اليوم" يتغير يومياً فلا تُعاد نتيجة يوم سابق، لكن التاريخ يبقى خارج مفتاح
+    # نقطة الحفظ حتى يُستأنف العمل المنقطع بعد منتصف الليل بدل البدء من جديد
+    if deterministic and any(config['type'] == "تاريخ" and config['value'] == "today"
+                             for config in placeholders_config.get('texts', {}).values()):
+        cache_key = CheckpointStore.job_key(
+            job_state['template_hash'], job_state['archive_hash'], job_state['config_hash'],
+            options + [date.today().isoformat()]
+        )
+    return job_state, job_key, cache_key
+
+def target_details(target, targets):
+    """تفاصيل المعالجة الخاصة بقالب واحد مع التفاصيل المشتركة (دون تفاصيل بقية قوالب الدفعة)"""
+    other_prefixes = tuple(f"[{other['name']}] " for other in targets if other is not target)
+    return [detail for detail in st.session_state.processing_details
+            if not other_prefixes or not detail['message'].startswith(other_prefixes)]
+
+def output_file_name(target, job_key, deterministic, batch):
+    """اسم ملف التحميل؛ يتضمن اسم القالب عند توليد عدة قوالب معاً"""
+    suffix = job_key[:12] if deterministic else datetime.now().strftime('%Y%m%d_%H%M%S')
+    if batch:
+        return f"PowerPoint_Updated_{os.path.splitext(target['name'])[0]}_{suffix}.pptx"
+    return f"PowerPoint_Updated_{suffix}.pptx"
+
+def fail_target(target, reason, message):
+    """تسجيل فشل قالب واحد دون إيقاف بقية قوالب الدفعة (تُعرض الرسالة مع النتائج)"""
+    target['outcome'] = 'failed'
+    target['error'] = message
+    target['report'](message, "error")
+    metrics.JOBS_FAILED.labels(reason=reason).inc()
+
+def run_generation(archive_digest, image_order_option, skip_empty_folders, workers=1,
+                   deterministic=False, shuffle_seed=0, include_template_slides=True):
+    """توليد العرض لكل قالب من ملف الصور المحفوظ في المخزن مع حفظ دوري للتقدم.
+    
+    الاستخراج وقراءة ملف البيانات وفحص المجلدات تتم مرة واحدة للدفعة كاملة، وتُقرأ صور
+    كل مجلد وتُعالج مرة واحدة لجميع القوالب"""
+    clear_details()
+    
+    targets = generation_targets()
+    batch = len(targets) > 1
+    for target in targets:
+        target['job_state'], target['job_key'], target['cache_key'] = generation_job(
+            target, archive_digest, image_order_option, skip_empty_folders, deterministic, shuffle_seed,
+            include_template_slides
+        )
+        if batch:
+            # تمييز تفاصيل كل قالب باسمه
+            target['report'] = lambda message, detail_type="info", name=target['name']: add_detail(
+                f"[{name}] {message}", detail_type
+            )
+        else:
+            target['report'] = add_detail
+    metrics.JOBS_STARTED.inc(len(targets))
+    metrics.JOBS_IN_PROGRESS.inc(len(targets))
+    
+    temp_dir = None
+    results_shown = False
+    try:
+        pending_targets = []
+        for target in targets:
+            cached = get_result_cache().get(target['cache_key']) if deterministic else None
+            if deterministic:
+                metrics.CACHE_REQUESTS.labels(result='hit' if cached else 'miss').inc()
+            if not cached:
+                pending_targets.append(target)
+                continue
             
-            temp_dir = None
-            try:
-                # استخراج الملف المضغوط
-                with st.spinner("📦 جاري استخراج الملفات..."):
-                    zip_bytes = io.BytesIO(uploaded_zip.read())
-                    with zipfile.ZipFile(zip_bytes, "r") as zip_ref:
-                        temp_dir = tempfile.mkdtemp()
-                        zip_ref.extractall(temp_dir)
-                
-                add_detail("📂 تم استخراج الملف المضغوط بنجاح", "success")
-                
-                # البحث عن المجلدات التي تحتوي على صور
-                all_items = os.listdir(temp_dir)
-                folder_paths = []
-                
-                for item in all_items:
-                    item_path = os.path.join(temp_dir, item)
-                    if os.path.isdir(item_path):
-                        imgs_in_folder = [f for f in os.listdir(item_path) 
-                                        if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp'))]
-                        if imgs_in_folder:
-                            folder_paths.append(item_path)
-                            add_detail(f"📁 المجلد '{item}' يحتوي على {len(imgs_in_folder)} صورة", "info")
-                        elif not skip_empty_folders:
-                            add_detail(f"⚠ المجلد '{item}' فارغ من الصور", "warning")
-                
-                if not folder_paths:
-                    st.error("❌ لا توجد مجلدات تحتوي على صور في الملف المضغوط.")
-                    add_detail("❌ لا توجد مجلدات تحتوي على صور", "error")
-                    show_details_section()
-                    st.stop()
+            # نفس العملية نُفذت سابقاً: إعادة الملف المحفوظ دون أي معالجة
+            with open(get_result_cache().deck_path(target['cache_key']), 'rb') as deck_file:
+                target['output_blob'] = get_blob_store().put_file(deck_file)
+            replayed = {detail['message'] for detail in st.session_state.processing_details}
+            for detail in cached['details']:
+                # تفاصيل الاستخراج المشتركة تظهر مرة واحدة في الدفعة
+                if detail['message'] not in replayed:
+                    add_detail(detail['message'], detail['type'])
+            target['report']("⚡ تم استخدام نتيجة محفوظة لنفس القالب والصور والإعدادات", "info")
+            target['result'] = cached
+            target['outcome'] = 'completed'
+            metrics.JOBS_COMPLETED.labels(source='cache').inc()
+            metrics.BYTES_EMITTED.labels(source='cache').inc(
+                os.path.getsize(get_result_cache().deck_path(target['cache_key']))
+            )
+        
+        if pending_targets:
+            # استخراج الملف المضغوط
+            with st.spinner("📦 جاري استخراج الملفات..."), metrics.STAGE_SECONDS.labels(stage='extract').time():
+                with zipfile.ZipFile(get_blob_store().path(archive_digest), "r") as zip_ref:
+                    temp_dir = tempfile.mkdtemp()
+                    extract_archive(zip_ref, temp_dir)
+                    try:
+                        folder_manifest, manifest_name = load_folder_manifest(zip_ref)
+                    except (ValueError, UnicodeDecodeError) as e:
+                        folder_manifest, manifest_name = None, None
+                        add_detail(f"⚠ تعذرت قراءة ملف البيانات: {e}", "warning")
+            
+            add_detail("📂 تم استخراج الملف المضغوط بنجاح", "success")
+            
+            # التحقق من أعمدة ملف البيانات المطلوبة في الإعدادات
+            required_columns = {
+                config['value']
+                for target in pending_targets
+                for config in target['placeholders_config'].get('texts', {}).values()
+                if config['type'] == "من ملف البيانات"
+            }
+            if folder_manifest is not None:
+                add_detail(f"🗂️ تم تحميل ملف البيانات '{manifest_name}' ({len(folder_manifest)} مجلد)", "success")
+                missing_columns = required_columns - manifest_columns(folder_manifest)
+                if missing_columns:
+                    add_detail(f"⚠ أعمدة غير موجودة في ملف البيانات: {', '.join(sorted(missing_columns))}", "warning")
+            elif required_columns:
+                add_detail(f"⚠ لا يوجد ملف بيانات ({', '.join(MANIFEST_NAMES)}) في جذر ملف ZIP", "warning")
+            
+            # البحث عن المجلدات التي تحتوي على صور
+            all_items = os.listdir(temp_dir)
+            folder_paths = []
+            
+            for item in all_items:
+                item_path = os.path.join(temp_dir, item)
+                if os.path.isdir(item_path):
+                    imgs_in_folder = list_folder_images(item_path)
+                    if imgs_in_folder:
+                        folder_paths.append(item_path)
+                        add_detail(f"📁 المجلد '{item}' يحتوي على {len(imgs_in_folder)} صورة", "info")
+                    elif not skip_empty_folders:
+                        add_detail(f"⚠ المجلد '{item}' فارغ من الصور", "warning")
+            
+            if not folder_paths:
+                st.error("❌ لا توجد مجلدات تحتوي على صور في الملف المضغوط.")
+                add_detail("❌ لا توجد مجلدات تحتوي على صور", "error")
+                metrics.JOBS_FAILED.labels(reason='no_images').inc(len(pending_targets))
+                for target in pending_targets:
+                    target['outcome'] = 'failed'
+                    target['error'] = "❌ لا توجد مجلدات تحتوي على صور"
+                # النتائج المحفوظة لبقية قوالب الدفعة تُعرض كالمعتاد
+                pending_targets = []
+            
+            folder_paths.sort()
+            add_detail(f"✅ تم العثور على {len(folder_paths)} مجلد يحتوي على صور", "success")
+            
+            checkpoints = get_checkpoint_store()
+            store = get_blob_store()
+            for target in pending_targets:
+                # البحث عن نقطة حفظ سابقة لنفس العملية
+                target['job_state']['total_folders'] = len(folder_paths)
+                checkpoint = checkpoints.load(target['job_key'])
+                if checkpoint and checkpoint.get('total_folders') != len(folder_paths):
+                    checkpoints.discard(target['job_key'])
+                    checkpoint = None
                 
-                folder_paths.sort()
-                add_detail(f"✅ تم العثور على {len(folder_paths)} مجلد يحتوي على صور", "success")
-
-                # تحميل ملف PowerPoint
-                with st.spinner("📄 جاري تحميل ملف PowerPoint..."):
-                    prs = Presentation(io.BytesIO(st.session_state.pptx_data))
+                # تحميل ملف PowerPoint (أو الشرائح المكتملة من نقطة الحفظ)
+                with st.spinner(f"📄 جاري تحميل ملف PowerPoint ({target['name']})..."):
+                    if store.exists(target['template_hash']):
+                        with store.open(target['template_hash']) as template_file:
+                            prs, slide_layout = open_template(template_file, include_template_slides)
+                        for segment_path in checkpoints.segment_paths(target['job_key'], checkpoint) if checkpoint else ():
+                            merge_slides(prs, Presentation(segment_path), skip=0)
+                    else:
+                        prs = None
+                    
+                    # القالب غير الصالح يُستبعد وحده وتكمل بقية قوالب الدفعة
+                    if prs is None:
+                        fail_target(target, 'template_expired',
+                                    f"❌ انتهت صلاحية القالب المحفوظ ({target['name']})، يرجى رفعه من جديد")
+                        if not batch:
+                            st.session_state.current_step = 1
+                        continue
                     
-                    if len(prs.slides) == 0:
-                        st.error("❌ لا توجد شرائح في ملف PowerPoint")
-                        st.stop()
+                    if slide_layout is None:
+                        fail_target(target, 'empty_template', f"❌ لا توجد شرائح في ملف PowerPoint ({target['name']})")
+                        continue
                 
-                first_slide = prs.slides[0]
-                slide_layout = first_slide.slide_layout
+                target['prs'] = prs
+                target['slide_layout'] = slide_layout
                 
                 # معالجة الشرائح
-                total_processed = 0
-                created_slides = 0
-                
-                progress_bar = st.progress(0)
+                target['created_slides'] = 0
+                target['total_processed'] = 0
+                target['start_folder'] = 0
+                target['saved_slides'] = len(prs.slides)
+                target['segments'] = checkpoint['segments'] if checkpoint else 0
+                if checkpoint:
+                    target['start_folder'] = checkpoint['next_folder']
+                    target['created_slides'] = checkpoint['created_slides']
+                    target['total_processed'] = checkpoint['total_processed']
+                    target['report'](f"⏯️ استئناف العملية من المجلد {target['start_folder'] + 1}/{len(folder_paths)}", "info")
+            
+            # القوالب التي تعذر تحميلها لا تدخل في التوليد
+            pending_targets = [target for target in pending_targets if 'outcome' not in target]
+            if pending_targets:
+                start_folder = min(target['start_folder'] for target in pending_targets)
+                progress_bar = st.progress(start_folder / len(folder_paths))
                 status_text = st.empty()
+                last_checkpoint = time.monotonic()
                 
-                for folder_idx, folder_path in enumerate(folder_paths):
-                    folder_name = os.path.basename(folder_path)
-                    status_text.text(f"🔄 معالجة المجلد {folder_idx + 1}/{len(folder_paths)}: {folder_name}")
-                    
-                    try:
-                        # ترتيب الصور في المجلد
-                        imgs = [f for f in os.listdir(folder_path) 
-                               if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp'))]
-                        
-                        if image_order_option == "عشوائي":
-                            random.shuffle(imgs)
-                            add_detail(f"🔀 تم ترتيب صور المجلد {folder_name} عشوائياً", "info")
-                        else:
-                            imgs.sort()
-                            add_detail(f"📋 تم ترتيب صور المجلد {folder_name} أبجدياً", "info")
+                def save_checkpoints(next_folder):
+                    """حفظ دوري للشرائح المضافة منذ آخر نقطة حفظ ومؤشر المجلد التالي لكل قالب"""
+                    nonlocal last_checkpoint
+                    if (time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL
+                            and next_folder < len(folder_paths)):
+                        for target in pending_targets:
+                            segment = None
+                            if len(target['prs'].slides) > target['saved_slides']:
+                                # الشرائح الجديدة فقط في نسخة من القالب دون شرائحه، فلا يُعاد حفظ العرض كاملاً
+                                with store.open(target['template_hash']) as template_file:
+                                    segment, _ = open_template(template_file, include_slides=False)
+                                merge_slides(segment, target['prs'], skip=target['saved_slides'])
+                            target['segments'] = checkpoints.save(target['job_key'], dict(
+                                target['job_state'],
+                                next_folder=max(next_folder, target['start_folder']),
+                                created_slides=target['created_slides'],
+                                total_processed=target['total_processed'],
+                                segments=target['segments']
+                            ), segment)
+                            target['saved_slides'] = len(target['prs'].slides)
+                        store.touch(archive_digest)
+                        last_checkpoint = time.monotonic()
+                
+                assemble_started = time.perf_counter()
+                if workers > 1 and len(folder_paths) - start_folder > 1:
+                    # توزيع المجلدات على عمليات منفصلة ثم دمج شرائح كل مجموعة بالترتيب
+                    add_detail(f"⚡ توزيع {len(folder_paths) - start_folder} مجلد على {workers} عمليات متوازية", "info")
+                    chunk_dir = tempfile.mkdtemp(dir=temp_dir)
+                    chunks = build_slides_parallel(
+                        [
+                            dict(
+                                template_path=store.path(target['template_hash']),
+                                slide_analysis=target['slide_analysis'],
+                                placeholders_config=target['placeholders_config'],
+                                start_folder=target['start_folder']
+                            )
+                            for target in pending_targets
+                        ],
+                        folder_paths,
+                        image_order_option,
+                        folder_manifest,
+                        workers,
+                        chunk_dir,
+                        shuffle_seed=shuffle_seed if deterministic else None
+                    )
+                    for chunk_end, chunk in chunks:
+                        for target, result in zip(pending_targets, chunk['targets']):
+                            with metrics.STAGE_SECONDS.labels(stage='merge').time():
+                                merge_slides(target['prs'], Presentation(result['output_path']), skip=0)
+                            os.remove(result['output_path'])
+                            for message, detail_type in result['details']:
+                                target['report'](message, detail_type)
+                            target['created_slides'] += result['created_slides']
+                            target['total_processed'] += result['total_processed']
+                        metrics.REGISTRY.merge(chunk['metrics'])
                         
-                        # إنشاء شريحة جديدة
-                        new_slide = prs.slides.add_slide(slide_layout)
-                        created_slides += 1
+                        status_text.text(f"🔄 تم دمج {chunk_end}/{len(folder_paths)} مجلد")
+                        progress_bar.progress(chunk_end / len(folder_paths))
+                        save_checkpoints(chunk_end)
+                else:
+                    image_cache = ImageCache()
+                    for folder_idx, folder_path in enumerate(folder_paths):
+                        if folder_idx < start_folder:
+                            continue
+                        folder_name = os.path.basename(folder_path)
+                        status_text.text(f"🔄 معالجة المجلد {folder_idx + 1}/{len(folder_paths)}: {folder_name}")
                         
-                        # تطبيق الإعدادات المحددة
-                        apply_configured_placeholders(
-                            new_slide, 
-                            folder_path, 
-                            folder_name, 
-                            st.session_state.slide_analysis,
-                            st.session_state.placeholders_config
-                        )
+                        # صور المجلد تُقرأ وتُعالج مرة واحدة لجميع القوالب
+                        for target in pending_targets:
+                            if folder_idx < target['start_folder']:
+                                continue
+                            created, images = build_folder_slide(
+                                target['prs'],
+                                target['slide_layout'],
+                                folder_path,
+                                target['slide_analysis'],
+                                target['placeholders_config'],
+                                image_order_option,
+                                folder_manifest.get(folder_name) if folder_manifest is not None else {},
+                                target['report'],
+                                shuffle_seed if deterministic else None,
+                                image_cache
+                            )
+                            target['created_slides'] += created
+                            target['total_processed'] += images
+                        image_cache.release(folder_path)
                         
-                        total_processed += len(imgs)
-                        add_detail(f"✅ تم إنشاء شريحة للمجلد '{folder_name}' مع {len(imgs)} صورة", "success")
-                    
-                    except Exception as e:
-                        add_detail(f"❌ خطأ في معالجة المجلد {folder_name}: {e}", "error")
-                    
-                    progress_bar.progress((folder_idx + 1) / len(folder_paths))
+                        progress_bar.progress((folder_idx + 1) / len(folder_paths))
+                        save_checkpoints(folder_idx + 1)
                 
+                metrics.STAGE_SECONDS.labels(stage='assemble').observe(time.perf_counter() - assemble_started)
                 progress_bar.empty()
                 status_text.empty()
                 
-                # عرض النتائج
-                st.success("🎉 تم الانتهاء من المعالجة بنجاح!")
-                
-                col1, col2, col3 = st.columns(3)
-                with col1: 
-                    st.metric("الشرائح المُضافة", created_slides)
-                with col2: 
-                    st.metric("المجلدات المُعالجة", len(folder_paths))
-                with col3:
-                    st.metric("إجمالي الصور", total_processed)
-                
-                if created_slides == 0:
-                    st.error("❌ لم يتم إضافة أي شرائح.")
-                    show_details_section()
-                    st.stop()
-                
-                # حفظ الملف وإتاحة التحميل
-                output_filename = f"PowerPoint_Updated_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pptx"
-                output_buffer = io.BytesIO()
-                prs.save(output_buffer)
-                output_buffer.seek(0)
-                
-                st.download_button(
-                    label="⬇️ تحميل الملف المُحدث",
-                    data=output_buffer.getvalue(),
-                    file_name=output_filename,
-                    mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-                    type="primary"
-                )
-                
-                # خيار البدء من جديد
-                if st.button("🔄 بدء عملية جديدة"):
-                    # إعادة تعيين جميع المتغيرات
-                    for key in list(st.session_state.keys()):
-                        del st.session_state[key]
-                    st.rerun()
-                
-                # إظهار التفاصيل
-                if not st.session_state.show_details_needed:
-                    if st.button("📋 إظهار تفاصيل المعالجة"):
-                        show_details_section()
-                else:
-                    show_details_section()
-                
-            except Exception as e:
-                st.error(f"❌ خطأ أثناء المعالجة: {e}")
-                add_detail(f"❌ خطأ عام أثناء المعالجة: {e}", "error")
-                show_details_section()
-            finally:
-                # تنظيف الملفات المؤقتة
-                if temp_dir and os.path.exists(temp_dir):
-                    try:
-                        shutil.rmtree(temp_dir)
-                        add_detail("🧹 تم تنظيف الملفات المؤقتة", "info")
-                    except Exception as cleanup_error:
-                        add_detail(f"⚠ خطأ في تنظيف الملفات المؤقتة: {cleanup_error}", "warning")
+                # حفظ الملفات
+                for target in pending_targets:
+                    output_filename = output_file_name(target, target['cache_key'], deterministic, batch)
+                    target['result'] = {
+                        'created_slides': target['created_slides'],
+                        'total_folders': len(folder_paths),
+                        'total_processed': target['total_processed'],
+                        'output_filename': output_filename
+                    }
+                    if target['created_slides'] == 0:
+                        target['outcome'] = 'failed'
+                        metrics.JOBS_FAILED.labels(reason='no_slides').inc()
+                        continue
+                    
+                    output_buffer = io.BytesIO()
+                    with metrics.STAGE_SECONDS.labels(stage='save').time():
+                        orphans, reclaimed = save_presentation(target['prs'], output_buffer, deterministic)
+                    if orphans:
+                        target['report'](f"🧹 تم حذف {orphans} علاقة وسائط غير مستخدمة قبل الحفظ "
+                                         f"(توفير {reclaimed / 1024:.0f} KB)", "info")
+                    target['output_blob'] = store.put_file(output_buffer)
+                    target['outcome'] = 'completed'
+                    metrics.JOBS_COMPLETED.labels(source='generated').inc()
+                    metrics.BYTES_EMITTED.labels(source='generated').inc(output_buffer.getbuffer().nbytes)
+                    if deterministic:
+                        get_result_cache().put(target['cache_key'], dict(
+                            target['result'],
+                            details=target_details(target, targets)
+                        ), output_buffer)
+                    output_buffer.close()
+                    checkpoints.discard(target['job_key'])
+        
+        set_session_blobs('output_blobs', [target.get('output_blob') for target in targets])
+        results_shown = True
+        show_generation_results(targets)
+        
+    except Exception as e:
+        st.error(f"❌ خطأ أثناء المعالجة: {e}")
+        add_detail(f"❌ خطأ عام أثناء المعالجة: {e}", "error")
+        unfinished = [target for target in targets if 'outcome' not in target]
+        for target in unfinished:
+            target['outcome'] = 'failed'
+            target['error'] = f"❌ خطأ أثناء المعالجة: {e}"
+        metrics.JOBS_FAILED.labels(reason='error').inc(len(unfinished))
+        if not results_shown and any(target.get('output_blob') for target in targets):
+            # القوالب التي اكتملت قبل الخطأ تبقى متاحة للتحميل
+            set_session_blobs('output_blobs', [target.get('output_blob') for target in targets])
+            show_generation_results(targets)
+        else:
+            show_details_section()
+    finally:
+        metrics.JOBS_IN_PROGRESS.dec(len(targets))
+        publish_metrics()
+        # تنظيف الملفات المؤقتة
+        if temp_dir and os.path.exists(temp_dir):
+            try:
+                shutil.rmtree(temp_dir)
+                add_detail("🧹 تم تنظيف الملفات المؤقتة", "info")
+            except Exception as cleanup_error:
+                add_detail(f"⚠ خطأ في تنظيف الملفات المؤقتة: {cleanup_error}", "warning")
+
+def show_generation_results(targets):
+    """عرض نتائج التوليد مع زر تحميل لكل قالب (الملفات محفوظة في output_blobs)"""
+    completed = sum(target.get('outcome') == 'completed' for target in targets)
+    if completed == len(targets):
+        st.success("🎉 تم الانتهاء من المعالجة بنجاح!")
+    elif completed:
+        st.warning(f"⚠ اكتمل {completed} من {len(targets)} قوالب")
+    
+    batch = len(targets) > 1
+    for target_idx, target in enumerate(targets):
+        result = target.get('result')
+        if batch:
+            st.markdown(f"#### 📄 {target['name']}")
+        
+        if result is None:
+            # القالب فشل قبل التوليد (انظر fail_target)
+            st.error(target['error'])
+            continue
+        
+        col1, col2, col3 = st.columns(3)
+        with col1: 
+            st.metric("الشرائح المُضافة", result['created_slides'])
+        with col2: 
+            st.metric("المجلدات المُعالجة", result['total_folders'])
+        with col3:
+            st.metric("إجمالي الصور", result['total_processed'])
+        
+        if target.get('outcome') != 'completed':
+            st.error(target.get('error') or "❌ لم يتم إضافة أي شرائح.")
+            continue
+        
+        st.download_button(
+            label="⬇️ تحميل الملف المُحدث",
+            data=get_blob_store().get(st.session_state.output_blobs[target_idx]),
+            file_name=result['output_filename'],
+            mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+            type="primary",
+            key=f"download_output_{target_idx}"
+        )
+    
+    if not completed:
+        show_details_section()
+        st.stop()
+    
+    # خيار البدء من جديد
+    if st.button("🔄 بدء عملية جديدة"):
+        # إعادة تعيين جميع المتغيرات
+        for key in list(st.session_state.keys()):
+            del st.session_state[key]
+        st.rerun()
+    
+    # إظهار التفاصيل
+    if not st.session_state.show_details_needed:
+        if st.button("📋 إظهار تفاصيل المعالجة"):
+            show_details_section()
+    else:
+        show_details_section()
 
 def main():
     """الدالة الرئيسية للتطبيق"""
+    get_metrics_server()
     
     # إضافة CSS مخصص للتحسينات البصرية
     st.markdown("""
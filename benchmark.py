@@ -0,0 +1,223 @@
+"""قياس أداء توليد الشرائح: المعالجة المتسلسلة مقابل العمليات المتوازية.
+
+يبني السكربت قالباً وملف صور تجريبيين (نفس بيانات loadtest.py)، ثم يولد
+العرض مرة بالمسار المتسلسل ومرة لكل عدد عمليات مطلوب، ويطبع الزمن ونسبة
+التسريع لكل مستوى، ويتحقق أن الناتج المتوازي مطابق للناتج المتسلسل بايتاً
+ببايت (الحفظ بالوضع الحتمي مع ترتيب عشوائي ثابت البذرة عند --shuffle).
+ويقيس أيضاً زمن الحفظ وحجم الناتج مع حذف الوسائط غير المستخدمة قبل الحفظ وبدونه
+(--template-orphans يضيف إلى القالب صوراً حُذفت عناصرها وبقيت علاقاتها).
+
+مثال:
+    python benchmark.py --workers 1,2,4,8 --folders 200 --images-per-folder 4 --template-orphans 8
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import zipfile
+import argparse
+import tempfile
+
+from PIL import Image
+from pptx import Presentation
+
+from loadtest import build_synthetic_template, build_synthetic_archive
+from slide_engine import (
+    analyze_slide_placeholders, list_folder_images, load_folder_manifest,
+    build_folder_slide, build_slides_parallel, merge_slides, save_presentation,
+    open_template, open_template_for_analysis
+)
+
+
+def default_config(slide_analysis):
+    """إعدادات تجريبية: استبدال كل الصور بالترتيب وملء النصوص باسم المجلد"""
+    return {
+        'images': {
+            f"image_{placeholder['id']}": {'use': True, 'order': i + 1, 'placeholder_info': placeholder}
+            for i, placeholder in enumerate(slide_analysis['image_placeholders'])
+        },
+        'texts': {
+            f"text_{placeholder['id']}": {'type': "اسم المجلد", 'value': "folder_name"}
+            for placeholder in slide_analysis['text_placeholders']
+        }
+    }
+
+
+def add_orphaned_media(template_bytes, count, image_size):
+    """إضافة صور إلى الشريحة الأولى ثم حذف عناصرها مع إبقاء علاقاتها ووسائطها في الحزمة
+    (كما يحدث عند حذف صورة بإزالة عنصر p:pic فقط)"""
+    prs = Presentation(io.BytesIO(template_bytes))
+    slide = prs.slides[0]
+    for orphan_idx in range(count):
+        image = io.BytesIO()
+        Image.effect_noise(image_size, 40 + orphan_idx).convert('RGB').save(image, 'JPEG', quality=90)
+        image.seek(0)
+        picture = slide.shapes.add_picture(image, 0, 0)
+        picture._element.getparent().remove(picture._element)
+    output = io.BytesIO()
+    prs.save(output)
+    return output.getvalue()
+
+
+def prepare_job(work_dir, template_bytes, archive_bytes):
+    """كتابة القالب واستخراج الصور كما تفعل الخطوة 3 في التطبيق"""
+    template_path = os.path.join(work_dir, 'template.pptx')
+    with open(template_path, 'wb') as template_file:
+        template_file.write(template_bytes)
+
+    images_dir = os.path.join(work_dir, 'images')
+    with zipfile.ZipFile(io.BytesIO(archive_bytes)) as zip_ref:
+        zip_ref.extractall(images_dir)
+        manifest, _ = load_folder_manifest(zip_ref)
+
+    folder_paths = sorted(
+        os.path.join(images_dir, item) for item in os.listdir(images_dir)
+        if os.path.isdir(os.path.join(images_dir, item))
+        and list_folder_images(os.path.join(images_dir, item))
+    )
+    slide_analysis = analyze_slide_placeholders(open_template_for_analysis(template_path))
+    return template_path, folder_paths, slide_analysis, default_config(slide_analysis), manifest
+
+
+def build_serial(template_path, folder_paths, slide_analysis, config, manifest, image_order,
+                 include_template_slides):
+    prs, slide_layout = open_template(template_path, include_template_slides)
+    for folder_path in folder_paths:
+        folder_name = os.path.basename(folder_path)
+        build_folder_slide(prs, slide_layout, folder_path, slide_analysis, config, image_order,
+                           manifest.get(folder_name) if manifest is not None else {}, shuffle_seed=0)
+    return prs
+
+
+def generate_serial(*job):
+    prs = build_serial(*job)
+    output = io.BytesIO()
+    save_presentation(prs, output, deterministic=True)
+    return output.getvalue()
+
+
+def generate_parallel(template_path, folder_paths, slide_analysis, config, manifest, image_order,
+                      include_template_slides, workers, work_dir):
+    prs, _ = open_template(template_path, include_template_slides)
+    chunk_dir = tempfile.mkdtemp(dir=work_dir)
+    target = {'template_path': template_path, 'slide_analysis': slide_analysis, 'placeholders_config': config}
+    chunks = build_slides_parallel([target], folder_paths, image_order, manifest, workers, chunk_dir,
+                                   shuffle_seed=0)
+    for _, chunk in chunks:
+        result = chunk['targets'][0]
+        merge_slides(prs, Presentation(result['output_path']), skip=0)
+        os.remove(result['output_path'])
+    output = io.BytesIO()
+    save_presentation(prs, output, deterministic=True)
+    return output.getvalue()
+
+
+def measure_save(job, remove_orphans, repeat):
+    """أفضل زمن لحفظ العرض المتسلسل (بدون زمن التوليد) مع حجم الناتج والبايتات المستعادة"""
+    best = None
+    for _ in range(repeat):
+        prs = build_serial(*job)
+        output = io.BytesIO()
+        started = time.perf_counter()
+        orphans, reclaimed = save_presentation(prs, output, deterministic=True, remove_orphans=remove_orphans)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {'remove_orphans': remove_orphans, 'seconds': best, 'output_bytes': output.getbuffer().nbytes,
+            'orphans': orphans, 'reclaimed_bytes': reclaimed}
+
+
+def timed(func, repeat):
+    """أفضل زمن من عدة تكرارات مع ناتج آخر تشغيل"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_benchmark(args):
+    template_bytes = build_synthetic_template(args.template_slides, args.template_pictures)
+    width, height = (int(value) for value in args.image_size.lower().split('x'))
+    if args.template_orphans:
+        template_bytes = add_orphaned_media(template_bytes, args.template_orphans, (width, height))
+    archive_bytes = build_synthetic_archive(args.folders, args.images_per_folder, (width, height))
+
+    work_dir = tempfile.mkdtemp(prefix='pptx_benchmark_')
+    try:
+        image_order = "عشوائي" if args.shuffle else "بالترتيب الأبجدي"
+        job = prepare_job(work_dir, template_bytes, archive_bytes) + (image_order, not args.without_template_slides)
+        serial_time, serial_output = timed(lambda: generate_serial(*job), args.repeat)
+        results = [{'mode': 'serial', 'workers': 1, 'seconds': serial_time, 'speedup': 1.0,
+                    'identical': True, 'output_bytes': len(serial_output)}]
+
+        for workers in args.workers:
+            print(f"🔄 {workers} عملية...", flush=True)
+            parallel_time, parallel_output = timed(
+                lambda: generate_parallel(*job, workers, work_dir), args.repeat
+            )
+            results.append({
+                'mode': 'parallel',
+                'workers': workers,
+                'seconds': parallel_time,
+                'speedup': serial_time / parallel_time,
+                'identical': parallel_output == serial_output,
+                'output_bytes': len(parallel_output)
+            })
+        
+        print("🔄 الحفظ مع حذف الوسائط غير المستخدمة وبدونه...", flush=True)
+        save_results = [measure_save(job, remove_orphans, args.repeat) for remove_orphans in (False, True)]
+        return results, save_results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_report(results, save_results):
+    print(f"{'mode':>9} {'workers':>8} {'seconds':>9} {'speedup':>8} {'MB':>7} {'identical':>10}")
+    for result in results:
+        print(f"{result['mode']:>9} {result['workers']:>8} {result['seconds']:>9.2f} "
+              f"{result['speedup']:>7.2f}x {result['output_bytes'] / 1024 / 1024:>7.1f} "
+              f"{'✅' if result['identical'] else '❌':>10}")
+    print(f"أنوية المعالج المتاحة: {os.cpu_count()}")
+    print()
+    print(f"{'orphan gc':>9} {'save s':>8} {'MB':>7} {'orphans':>8} {'reclaimed MB':>13}")
+    for result in save_results:
+        print(f"{'on' if result['remove_orphans'] else 'off':>9} {result['seconds']:>8.3f} "
+              f"{result['output_bytes'] / 1024 / 1024:>7.2f} {result['orphans']:>8} "
+              f"{result['reclaimed_bytes'] / 1024 / 1024:>13.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس أداء توليد الشرائح بالتوازي")
+    parser.add_argument('--workers', default='1,2,4', help="أعداد العمليات المتوازية مفصولة بفواصل")
+    parser.add_argument('--folders', type=int, default=100)
+    parser.add_argument('--images-per-folder', type=int, default=3)
+    parser.add_argument('--image-size', default='1024x768')
+    parser.add_argument('--template-slides', type=int, default=0, help="شرائح إضافية في القالب")
+    parser.add_argument('--template-pictures', type=int, default=1, help="عدد الصور العادية في القالب")
+    parser.add_argument('--template-orphans', type=int, default=0,
+                        help="صور بعلاقات ميتة في القالب (بحجم --image-size)")
+    parser.add_argument('--without-template-slides', action='store_true',
+                        help="توليد الشرائح الجديدة فقط دون قراءة شرائح القالب أو نسخها")
+    parser.add_argument('--shuffle', action='store_true', help="ترتيب عشوائي للصور (ببذرة ثابتة)")
+    parser.add_argument('--repeat', type=int, default=1, help="عدد التكرارات لكل قياس (يؤخذ أفضلها)")
+    parser.add_argument('--json', help="حفظ النتائج بصيغة JSON في هذا المسار")
+    args = parser.parse_args(argv)
+    args.workers = [int(level) for level in args.workers.split(',') if level.strip()]
+
+    results, save_results = run_benchmark(args)
+    print_report(results, save_results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump({'results': results, 'save': save_results, 'cpu_count': os.cpu_count(),
+                       'config': vars(args)},
+                      output, ensure_ascii=False, indent=2)
+    return 0 if all(result['identical'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
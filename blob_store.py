@@ -0,0 +1,106 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+
+class BlobStore:
+    """مخزن ملفات مشترك على القرص مفهرس ببصمة المحتوى (SHA-256)"""
+
+    CHUNK_SIZE = 1024 * 1024
+    SWEEP_INTERVAL = 60
+
+    def __init__(self, root, ttl_seconds=6 * 60 * 60):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._last_sweep = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, digest):
+        """مسار الملف على القرص لبصمة معينة"""
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest):
+        return bool(digest) and os.path.exists(self.path(digest))
+
+    def put(self, data):
+        """تخزين بيانات (bytes) وإرجاع بصمتها"""
+        return self.put_stream(_chunks(data, self.CHUNK_SIZE))
+
+    def put_file(self, fileobj):
+        """تخزين محتوى ملف مفتوح على دفعات دون تحميله كاملاً في الذاكرة"""
+        if hasattr(fileobj, 'seek'):
+            fileobj.seek(0)
+        return self.put_stream(iter(lambda: fileobj.read(self.CHUNK_SIZE), b''))
+
+    def put_stream(self, chunks):
+        """كتابة الدفعات إلى ملف مؤقت ثم نقله ذرياً إلى موقعه حسب البصمة"""
+        if time.time() - self._last_sweep > self.SWEEP_INTERVAL:
+            self.sweep()
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    tmp_file.write(chunk)
+            digest = hasher.hexdigest()
+            target = self.path(digest)
+            # الاستبدال حتى لو وُجد المحتوى مسبقاً (نفس القالب من جلسة أخرى): نفس البيانات بوقت
+            # استخدام جديد، ولا يتأثر بحذف sweep للنسخة القديمة في نفس اللحظة (ولو من عملية أخرى)
+            with self._lock:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp_path, target)
+            return digest
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open(self, digest):
+        """فتح الملف للقراءة مع تحديث وقت آخر استخدام"""
+        target = self.path(digest)
+        os.utime(target)
+        return open(target, 'rb')
+
+    def touch(self, digest):
+        """تحديث وقت آخر استخدام حتى لا يُحذف الملف بانتهاء المدة"""
+        if self.exists(digest):
+            os.utime(self.path(digest))
+
+    def get(self, digest):
+        with self.open(digest) as blob_file:
+            return blob_file.read()
+
+    def sweep(self):
+        """حذف الملفات التي لم تُستخدم منذ مدة أطول من ttl_seconds.
+
+        هذه هي الطريقة الوحيدة لحذف الملفات: الجلسات النشطة تحدّث وقت استخدام ملفاتها (open/touch)،
+        والجلسات المغلقة لا تُبلغ عن انتهائها، وقد يتشارك المخزن عدة عمليات خادم"""
+        self._last_sweep = time.time()
+        cutoff = self._last_sweep - self.ttl_seconds
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                file_path = os.path.join(dirpath, filename)
+                with self._lock:
+                    try:
+                        if os.path.getmtime(file_path) < cutoff:
+                            os.remove(file_path)
+                            removed += 1
+                    except OSError:
+                        continue
+        return removed
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
+
+
+def _chunks(data, chunk_size):
+    """تقسيم bytes إلى دفعات"""
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
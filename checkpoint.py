@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+
+
+class CheckpointStore:
+    """حفظ تقدم عمليات التوليد الطويلة على القرص لاستئنافها بعد الانقطاع"""
+
+    STATE_FILE = 'state.json'
+
+    def __init__(self, root, ttl_seconds=7 * 24 * 60 * 60):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def job_key(template_hash, archive_hash, config_hash, options):
+        """مفتاح ثابت للعملية: نفس القالب والصور والإعدادات والخيارات = نفس العملية"""
+        payload = json.dumps(
+            [template_hash, archive_hash, config_hash, options],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _job_dir(self, job_key):
+        return os.path.join(self.root, job_key)
+
+    def segment_path(self, job_key, index):
+        return os.path.join(self._job_dir(job_key), f'segment_{index:05d}.pptx')
+
+    def segment_paths(self, job_key, state):
+        """ملفات الشرائح المكتملة بالترتيب؛ تُدمج في القالب عبر merge_slides(prs, segment, skip=0)"""
+        return [self.segment_path(job_key, index) for index in range(state['segments'])]
+
+    def load(self, job_key):
+        """قراءة حالة آخر نقطة حفظ، أو None إن لم توجد"""
+        state_path = os.path.join(self._job_dir(job_key), self.STATE_FILE)
+        try:
+            with open(state_path, encoding='utf-8') as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            return None
+        # نقاط الحفظ القديمة (ملف deck.pptx كامل) لا تحتوي على segments فلا تُستأنف
+        if not isinstance(state.get('segments'), int):
+            return None
+        if not all(os.path.exists(path) for path in self.segment_paths(job_key, state)):
+            return None
+        return state
+
+    def save(self, job_key, state, segment=None):
+        """حفظ الشرائح المضافة منذ آخر نقطة حفظ (segment) كملف جديد ثم حالة المؤشر وإرجاع عدد الملفات.
+
+        لا تُعاد كتابة الشرائح السابقة فيتناسب زمن الحفظ مع الشرائح الجديدة فقط؛ الكتابة ذرية"""
+        job_dir = self._job_dir(job_key)
+        os.makedirs(job_dir, exist_ok=True)
+
+        segments = state.get('segments', 0)
+        if segment is not None:
+            fd, tmp_deck = tempfile.mkstemp(dir=job_dir, suffix='.part')
+            with os.fdopen(fd, 'wb') as deck_file:
+                segment.save(deck_file)
+            os.replace(tmp_deck, self.segment_path(job_key, segments))
+            segments += 1
+
+        state = dict(state, segments=segments, job_key=job_key, updated_at=time.time())
+        fd, tmp_state = tempfile.mkstemp(dir=job_dir, suffix='.part')
+        with os.fdopen(fd, 'w', encoding='utf-8') as state_file:
+            json.dump(state, state_file, ensure_ascii=False)
+        os.replace(tmp_state, os.path.join(job_dir, self.STATE_FILE))
+        return segments
+
+    def discard(self, job_key):
+        shutil.rmtree(self._job_dir(job_key), ignore_errors=True)
+
+    def pending(self, **filters):
+        """العمليات غير المكتملة المطابقة للقيم المحددة (مثل template_hash)"""
+        self.sweep()
+        states = []
+        for job_key in os.listdir(self.root):
+            state = self.load(job_key)
+            if state and all(state.get(key) == value for key, value in filters.items()):
+                states.append(state)
+        return sorted(states, key=lambda state: state.get('updated_at', 0), reverse=True)
+
+    def sweep(self):
+        """حذف نقاط الحفظ الأقدم من ttl_seconds"""
+        cutoff = time.time() - self.ttl_seconds
+        for job_key in os.listdir(self.root):
+            # المجلدات التي لم تُكتب حالتها بعد تُقاس بوقت تعديل المجلد نفسه
+            try:
+                if os.path.getmtime(self._job_dir(job_key)) < cutoff:
+                    self.discard(job_key)
+            except OSError:
+                continue
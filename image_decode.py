@@ -0,0 +1,200 @@
+import io
+import os
+import math
+import threading
+
+from PIL import Image, ImageFile
+
+import metrics
+
+# حدود فك ترميز الصور الكبيرة (بانوراما الدرون، المخططات الممسوحة ضوئياً):
+# الصور الأكبر من MAX_IMAGE_PIXELS تُصغَّر قبل إدراجها، ومجموع ما يُفك في الذاكرة
+# لصورة واحدة (القطعة الجاري فكها + الصورة المصغرة) لا يتجاوز MAX_DECODE_BYTES
+# مهما كان حجم الملف الأصلي.
+MAX_IMAGE_PIXELS = int(float(os.environ.get('PPTX_MAX_IMAGE_PIXELS', 24_000_000)))
+MAX_DECODE_BYTES = int(float(os.environ.get('PPTX_MAX_DECODE_MB', 192)) * 1024 * 1024)
+JPEG_DRAFT_SCALES = (1, 2, 4, 8)
+READ_BLOCK = 64 * 1024
+# عدد البتات لكل بكسل في البيانات غير المضغوطة (لتقسيمها إلى شرائط من الصفوف)
+RAW_BITS = {
+    '1': 1, '1;I': 1, 'L': 8, 'L;I': 8, 'P': 8, 'P;8': 8, 'LA': 16, 'I;16': 16, 'I;16B': 16,
+    'RGB': 24, 'BGR': 24, 'RGBX': 32, 'RGBA': 32, 'BGRA': 32, 'BGRX': 32, 'CMYK': 32
+}
+
+# القطع namedtuple منذ Pillow 11، وtuple عادية في الإصدارات الأقدم
+Tile = getattr(ImageFile, '_Tile', None) or (lambda *fields: tuple(fields))
+
+# فحص DecompressionBomb في Pillow يمنع حتى قراءة رأس الملف للصور الضخمة؛ يُعطَّل عند
+# فتحها في prepare_picture فقط (الحدود أعلاه تحل محله) ويبقى فعالاً لبقية العملية
+_bomb_check_lock = threading.Lock()
+
+
+def _open_unchecked(image_path):
+    """Image.open دون فحص DecompressionBomb؛ فك الترميز بعدها مقيد بحدود هذه الوحدة"""
+    with _bomb_check_lock:
+        limit, Image.MAX_IMAGE_PIXELS = Image.MAX_IMAGE_PIXELS, None
+        try:
+            return Image.open(image_path)
+        finally:
+            Image.MAX_IMAGE_PIXELS = limit
+
+
+def decoded_bytes(size, mode):
+    """حجم الصورة بعد فك ترميزها في ذاكرة Pillow (RGB تُخزن بأربعة بايتات لكل بكسل)"""
+    width, height = size
+    if mode in ('1', 'L', 'P'):
+        pixel_bytes = 1
+    elif mode.startswith('I;16'):
+        pixel_bytes = 2
+    else:
+        pixel_bytes = 4
+    return width * height * pixel_bytes
+
+
+def target_size(size, max_pixels):
+    """أكبر أبعاد بنفس النسبة لا يتجاوز عدد بكسلاتها max_pixels"""
+    width, height = size
+    if width * height <= max_pixels:
+        return size
+    factor = math.sqrt(width * height / max_pixels)
+    return max(1, int(width / factor)), max(1, int(height / factor))
+
+
+def prepare_picture(image_path, max_pixels=None, max_decode_bytes=None):
+    """الصورة الجاهزة للإدراج: المسار الأصلي إن كانت ضمن الحد، وإلا نسخة مصغرة (BytesIO).
+
+    يُرجع (المصدر، رسالة أو None). تُقرأ الأبعاد من رأس الملف فقط، ثم يُفك الترميز
+    بأقل ذاكرة ممكنة: تصغير JPEG أثناء فك الترميز (draft)، أو قطعة بعد قطعة للصيغ
+    المقسمة (مثل TIFF)، وإن تعذر ذلك ضمن الحد تُدرج الصورة الأصلية دون فك ترميزها."""
+    max_pixels = max_pixels or MAX_IMAGE_PIXELS
+    max_decode_bytes = max_decode_bytes or MAX_DECODE_BYTES
+    name = os.path.basename(image_path)
+
+    with _open_unchecked(image_path) as img:
+        if img.width * img.height <= max_pixels:
+            return image_path, None
+
+        original_size = img.size
+        # نصف الحد للصورة المصغرة والنصف الآخر لما يُفك منها
+        output_pixels = max_decode_bytes // 2 // decoded_bytes((1, 1), img.mode)
+        size = target_size(img.size, min(max_pixels, output_pixels))
+        try:
+            if img.format == 'JPEG':
+                reduced, method = _reduce_jpeg(img, size, max_decode_bytes // 2), 'jpeg_draft'
+            elif decoded_bytes(img.size, img.mode) <= max_decode_bytes // 2:
+                img.load()
+                reduced, method = img.resize(size, Image.LANCZOS), 'full'
+            else:
+                # القطعة ونسختها المصغرة معاً ضمن النصف المتبقي
+                reduced, method = _reduce_tiles(img, size, max_decode_bytes // 4), 'tiles'
+        except (OSError, ValueError, TypeError, AttributeError, MemoryError) as e:
+            # TypeError/AttributeError: واجهات Pillow الداخلية المستخدمة في _reduce_tiles تغيرت
+            metrics.IMAGES_DOWNSCALED.labels(method='failed').inc()
+            return image_path, f"⚠ تعذر تصغير الصورة {name} ({e})؛ أُدرجت بحجمها الأصلي"
+
+        if reduced is None:
+            metrics.IMAGES_DOWNSCALED.labels(method='skipped').inc()
+            return image_path, (f"⚠ الصورة {name} ({original_size[0]}×{original_size[1]}) تتجاوز حد الذاكرة "
+                                f"ولا يمكن فكها على أجزاء؛ أُدرجت بحجمها الأصلي")
+
+        output = io.BytesIO()
+        if img.format == 'JPEG' or reduced.mode == 'CMYK':
+            reduced.save(output, 'JPEG', quality=90, exif=img.info.get('exif', b''))
+        else:
+            reduced.save(output, 'PNG')
+        output.seek(0)
+        metrics.IMAGES_DOWNSCALED.labels(method=method).inc()
+        return output, (f"📐 تم تصغير الصورة {name} من {original_size[0]}×{original_size[1]} "
+                        f"إلى {reduced.width}×{reduced.height}")
+
+
+def _reduce_jpeg(img, size, max_decode_bytes):
+    """فك ترميز JPEG بمقياس مصغر (1/2، 1/4، 1/8) مباشرة من معاملات DCT"""
+    width, height = img.size
+    fitting = [
+        scale for scale in JPEG_DRAFT_SCALES
+        if decoded_bytes((math.ceil(width / scale), math.ceil(height / scale)), img.mode) <= max_decode_bytes
+    ]
+    if not fitting:
+        return None
+    # أقل تصغير ممكن يبقى أكبر من الحجم المطلوب، بشرط ألا يتجاوز حد الذاكرة
+    sharp = [scale for scale in JPEG_DRAFT_SCALES if width // scale >= size[0] and height // scale >= size[1]]
+    scale = max(fitting[0], max(sharp) if sharp else 1)
+    img.draft(img.mode, (width // scale, height // scale))
+    img.load()
+    if img.width <= size[0] or img.height <= size[1]:
+        # حد الذاكرة فرض تصغيراً أكبر من المطلوب؛ لا داعي لتكبيرها من جديد
+        return img.copy()
+    return img.resize(size, Image.LANCZOS)
+
+
+def _reduce_tiles(img, size, max_decode_bytes):
+    """فك ترميز الصورة قطعة بعد قطعة (strips/tiles) وتصغير كل قطعة في مكانها"""
+    width, height = img.size
+    scale_x, scale_y = size[0] / width, size[1] / height
+    tiles = []
+    for tile in img.tile:
+        tiles.extend(_split_raw_tile(img.mode, tile, max_decode_bytes))
+    if any(decoded_bytes((x1 - x0, y1 - y0), img.mode) > max_decode_bytes
+           for _, (x0, y0, x1, y1), _, _ in tiles):
+        return None
+
+    output = Image.new(img.mode, size)
+    if img.mode == 'P' and img.palette:
+        # img.palette متاح من رأس الملف؛ getpalette() كانت ستفك ترميز الصورة كاملة
+        output.putpalette(img.palette)
+
+    for decoder_name, (x0, y0, x1, y1), offset, args in tiles:
+        tile = Image.new(img.mode, (x1 - x0, y1 - y0))
+        decoder = Image._getdecoder(img.mode, decoder_name, args, getattr(img, 'decoderconfig', ()))
+        decoder.setimage(tile.im, (0, 0, x1 - x0, y1 - y0))
+        img.fp.seek(offset)
+        try:
+            if decoder.pulls_fd:
+                decoder.setfd(img.fp)
+                _, error_code = decoder.decode(b'')
+            else:
+                buffer = b''
+                error_code = 0
+                while True:
+                    data = img.fp.read(READ_BLOCK)
+                    if not data:
+                        break
+                    buffer += data
+                    consumed, error_code = decoder.decode(buffer)
+                    if consumed < 0:
+                        break
+                    buffer = buffer[consumed:]
+        finally:
+            decoder.cleanup()
+        if error_code < 0:
+            raise OSError(f"decoder error {error_code}")
+
+        box = (round(x0 * scale_x), round(y0 * scale_y), round(x1 * scale_x), round(y1 * scale_y))
+        if box[2] > box[0] and box[3] > box[1]:
+            output.paste(tile.resize((box[2] - box[0], box[3] - box[1]), Image.LANCZOS), box[:2])
+        del tile
+    return output
+
+
+def _split_raw_tile(mode, tile, max_decode_bytes):
+    """تقسيم قطعة غير مضغوطة (BMP، TIFF بشريط واحد...) إلى شرائط صفوف ضمن حد الذاكرة"""
+    decoder_name, (x0, y0, x1, y1), offset, args = tile
+    if (decoder_name != 'raw' or decoded_bytes((x1 - x0, y1 - y0), mode) <= max_decode_bytes
+            or not isinstance(args, tuple) or len(args) < 3):
+        return [tile]
+    rawmode, stride, orientation = args[:3]
+    if not stride:
+        if rawmode not in RAW_BITS:
+            return [tile]
+        stride = ((x1 - x0) * RAW_BITS[rawmode] + 7) // 8
+    rows = max(1, max_decode_bytes // decoded_bytes((x1 - x0, 1), mode))
+
+    bands = []
+    for top in range(y0, y1, rows):
+        bottom = min(top + rows, y1)
+        # الصفوف مخزنة من الأسفل للأعلى عندما يكون الاتجاه سالباً (مثل BMP)
+        first_row = top - y0 if orientation >= 0 else y1 - bottom
+        bands.append(Tile(decoder_name, (x0, top, x1, bottom), offset + first_row * stride,
+                          (rawmode, stride, orientation) + tuple(args[3:])))
+    return bands
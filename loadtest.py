@@ -0,0 +1,569 @@
+"""اختبار تحميل لنسخة محلية من التطبيق عبر جلسات Streamlit متزامنة بدون واجهة.
+
+يشغّل السكربت خادم `streamlit run app.py` محلياً (أو يتصل بخادم محلي قائم)
+ثم يفتح عدة جلسات عبر نفس بروتوكول WebSocket ورفع الملفات الذي يستخدمه
+المتصفح، ويمرّ بكل جلسة على الخطوات الثلاث ببيانات تجريبية. يسجل زمن كل
+خطوة (p50/p90/p99) والذاكرة المقيمة واستهلاك المعالج لعملية الخادم،
+ويحدد مستوى التزامن الذي يبدأ عنده التشبع.
+
+يتطلب حزمة websockets (تُثبت مع الإصدارات الحديثة من Streamlit)، وقراءة
+موارد الخادم تعتمد على /proc (لينكس).
+
+مثال:
+    python loadtest.py --levels 1,2,4,8 --folders 20 --images-per-folder 4
+"""
+import os
+import io
+import sys
+import json
+import time
+import uuid
+import random
+import socket
+import asyncio
+import zipfile
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+STEPS = ('step1_upload_pptx', 'step2_configure', 'step3_generate')
+
+
+def build_synthetic_template(extra_slides=0, pictures=1):
+    """إنشاء قالب تجريبي يحتوي على موضع صورة وموضع نص وعنوان وصور عادية"""
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[8])
+    sample = io.BytesIO()
+    Image.new('RGB', (200, 150), (200, 60, 60)).save(sample, 'PNG')
+    for picture_idx in range(pictures):
+        # شبكة من الصور الصغيرة بجانب موضع الصورة الأساسي
+        column, row = picture_idx % 6, picture_idx // 6
+        sample.seek(0)
+        slide.shapes.add_picture(sample, Inches(7 + column * 0.45), Inches(0.2 + row * 0.4),
+                                 Inches(0.4), Inches(0.3))
+    for _ in range(extra_slides):
+        prs.slides.add_slide(prs.slide_layouts[1])
+    output = io.BytesIO()
+    prs.save(output)
+    return output.getvalue()
+
+
+def build_synthetic_archive(folders, images_per_folder, image_size, seed=0):
+    """إنشاء ملف ZIP تجريبي: مجلد لكل شريحة وعدة صور JPEG في كل مجلد"""
+    rnd = random.Random(seed)
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w') as archive:
+        for folder_idx in range(folders):
+            for image_idx in range(images_per_folder):
+                color = (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256))
+                image_bytes = io.BytesIO()
+                Image.new('RGB', image_size, color).save(image_bytes, 'JPEG', quality=85)
+                archive.writestr(f'folder_{folder_idx:04d}/img_{image_idx:02d}.jpg', image_bytes.getvalue())
+    return output.getvalue()
+
+
+class LocalServer:
+    """تشغيل خادم Streamlit محلي للتطبيق على منفذ حر"""
+
+    def __init__(self, port=None, env=None):
+        self.port = port or _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = env
+        self.process = None
+
+    def start(self, timeout=60):
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', APP_PATH,
+             '--server.headless', 'true',
+             '--server.port', str(self.port),
+             '--server.address', '127.0.0.1',
+             '--server.enableXsrfProtection', 'false',
+             '--server.enableCORS', 'false',
+             '--server.fileWatcherType', 'none',
+             '--browser.gatherUsageStats', 'false'],
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("توقف خادم Streamlit أثناء التشغيل")
+            try:
+                with urllib.request.urlopen(f"{self.url}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return self
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("انتهت مهلة انتظار تشغيل خادم Streamlit")
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class HeadlessSession:
+    """جلسة متصفح بدون واجهة تتحدث بروتوكول Streamlit مباشرة"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session_id = None
+        self.widget_states = {}
+        self.elements = []
+        self.fragment_ids = {}
+        self.messages_received = 0
+        self.bytes_received = 0
+        self._websocket = None
+        self._reader = None
+        self._run_done = None
+        self._pending_urls = {}
+
+    async def connect(self):
+        import websockets
+
+        ws_url = self.base_url.replace('http', 'ws', 1) + '/_stcore/stream'
+        self._websocket = await websockets.connect(
+            ws_url, subprotocols=['streamlit'], max_size=None
+        )
+        self._reader = asyncio.create_task(self._read_loop())
+        await self.rerun()
+
+    async def close(self):
+        if self._websocket is not None:
+            await self._websocket.close()
+        if self._reader is not None:
+            self._reader.cancel()
+
+    async def _read_loop(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        async for payload in self._websocket:
+            self.messages_received += 1
+            self.bytes_received += len(payload)
+            msg = ForwardMsg()
+            msg.ParseFromString(payload)
+            msg_type = msg.WhichOneof('type')
+            if msg_type == 'new_session':
+                self.session_id = msg.new_session.initialize.session_id
+                # تشغيل fragment لا يعيد رسم بقية الصفحة
+                if not msg.new_session.fragment_ids_this_run:
+                    self.elements = []
+            elif msg_type == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                element = msg.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type:
+                    widget = getattr(element, element_type)
+                    self.elements.append((element_type, widget))
+                    if msg.delta.fragment_id and hasattr(widget, 'id'):
+                        self.fragment_ids[widget.id] = msg.delta.fragment_id
+            elif msg_type == 'file_urls_response':
+                future = self._pending_urls.pop(msg.file_urls_response.response_id, None)
+                if future and not future.done():
+                    future.set_result(msg.file_urls_response)
+            elif msg_type == 'script_finished':
+                if (msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN
+                        and self._run_done and not self._run_done.done()):
+                    self._run_done.set_result(msg.script_finished)
+
+    async def rerun(self, fragment_id=''):
+        """إرسال حالة الأدوات الحالية وانتظار انتهاء تشغيل السكربت"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        msg = BackMsg()
+        msg.rerun_script.SetInParent()
+        msg.rerun_script.fragment_id = fragment_id
+        for state in self.widget_states.values():
+            msg.rerun_script.widget_states.widgets.append(state)
+        self._run_done = asyncio.get_running_loop().create_future()
+        await self._websocket.send(msg.SerializeToString())
+        await asyncio.wait_for(self._run_done, self.timeout)
+        # الأزرار تُرسل مرة واحدة فقط مثل المتصفح
+        for widget_id in [w for w, s in self.widget_states.items() if s.HasField('trigger_value')]:
+            del self.widget_states[widget_id]
+        self.raise_for_errors()
+
+    def raise_for_errors(self):
+        from streamlit.proto.Alert_pb2 import Alert
+
+        for element_type, element in self.elements:
+            if element_type == 'exception':
+                raise RuntimeError(element.message)
+            if element_type == 'alert' and element.format == Alert.ERROR:
+                raise RuntimeError(element.body)
+
+    def find(self, element_type, id_part=None, label_part=None):
+        for found_type, element in self.elements:
+            if found_type != element_type:
+                continue
+            if id_part and id_part not in element.id:
+                continue
+            if label_part and label_part not in element.label:
+                continue
+            return element
+        raise RuntimeError(f"العنصر غير موجود: {element_type} {id_part or label_part}")
+
+    async def click(self, label_part):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        button = self.find('button', label_part=label_part)
+        self.widget_states[button.id] = WidgetState(id=button.id, trigger_value=True)
+        await self.rerun()
+
+    def set_radio(self, id_part, option):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        for element_type, element in self.elements:
+            if element_type == 'radio' and id_part in element.id:
+                state = WidgetState(id=element.id)
+                # الإصدارات الحديثة ترسل نص الخيار، والأقدم ترسل رقمه
+                if 'raw_value' in element.DESCRIPTOR.fields_by_name:
+                    state.string_value = option
+                else:
+                    state.int_value = list(element.options).index(option)
+                self.widget_states[element.id] = state
+
+    async def toggle_checkbox(self, id_part):
+        """تغيير قيمة checkbox وإعادة التشغيل كما يفعل المتصفح (داخل fragment إن وجد)"""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        checkbox = self.find('checkbox', id_part=id_part)
+        previous = self.widget_states.get(checkbox.id)
+        current = checkbox.value if checkbox.set_value else checkbox.default
+        value = not (previous.bool_value if previous else current)
+        self.widget_states[checkbox.id] = WidgetState(id=checkbox.id, bool_value=value)
+        await self.rerun(self.fragment_ids.get(checkbox.id, ''))
+
+    async def upload(self, id_part, file_name, data):
+        """رفع ملف بنفس تسلسل المتصفح: طلب رابط، ثم PUT، ثم تحديث حالة الأداة"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.Common_pb2 import FileUploaderState, UploadedFileInfo
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        uploader = self.find('file_uploader', id_part=id_part)
+        request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._pending_urls[request_id] = future
+
+        msg = BackMsg()
+        msg.file_urls_request.request_id = request_id
+        msg.file_urls_request.session_id = self.session_id
+        msg.file_urls_request.file_names.append(file_name)
+        await self._websocket.send(msg.SerializeToString())
+        response = await asyncio.wait_for(future, self.timeout)
+        file_urls = response.file_urls[0]
+
+        upload_url = file_urls.upload_url
+        if upload_url.startswith('/'):
+            upload_url = self.base_url + upload_url
+        await asyncio.to_thread(_put_multipart, upload_url, file_name, data)
+
+        state = FileUploaderState()
+        state.uploaded_file_info.append(UploadedFileInfo(
+            file_id=file_urls.file_id, name=file_name, size=len(data), file_urls=file_urls
+        ))
+        self.widget_states[uploader.id] = WidgetState(
+            id=uploader.id, file_uploader_state_value=state
+        )
+        await self.rerun()
+
+
+def _put_multipart(url, file_name, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="{uuid.uuid4().hex}"; filename="{file_name}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'
+    ).encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    request = urllib.request.Request(url, data=body, method='PUT', headers={
+        'Content-Type': f'multipart/form-data; boundary={boundary}'
+    })
+    with urllib.request.urlopen(request) as response:
+        response.read()
+
+
+async def run_session(base_url, template_bytes, archive_bytes, timeout):
+    """تشغيل جلسة كاملة عبر الخطوات الثلاث وإرجاع زمن كل خطوة بالثواني"""
+    timings = {}
+    session = HeadlessSession(base_url, timeout)
+    await session.connect()
+    try:
+        start = time.perf_counter()
+        await session.upload('pptx_uploader', 'template.pptx', template_bytes)
+        await session.click('تحليل القالب')
+        timings[STEPS[0]] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        session.set_radio('text_fill_option_', 'اسم المجلد')
+        await session.rerun()
+        await session.click('المتابعة للمعالجة')
+        timings[STEPS[1]] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await session.upload('zip_uploader', 'images.zip', archive_bytes)
+        # كل الجلسات ترسل نفس الملف؛ في الوضع الحتمي ستكون كلها نتيجة محفوظة بدلاً من توليد فعلي
+        await session.toggle_checkbox('deterministic_output')
+        await session.click('بدء المعالجة')
+        session.find('download_button')
+        timings[STEPS[2]] = time.perf_counter() - start
+    finally:
+        await session.close()
+    return timings
+
+
+async def measure_step2_reruns(base_url, template_bytes, reruns, timeout):
+    """زمن إعادة التشغيل بعد تغيير أداة واحدة في إعداد الخطوة 2"""
+    session = HeadlessSession(base_url, timeout)
+    await session.connect()
+    latencies = []
+    traffic = []
+    try:
+        await session.upload('pptx_uploader', 'template.pptx', template_bytes)
+        await session.click('تحليل القالب')
+        # القوالب الكبيرة تفتح المحرر الجدولي افتراضياً؛ القياس يخص الإعداد التفصيلي
+        session.set_radio('config_mode', 'إعداد تفصيلي')
+        await session.rerun()
+        checkbox_ids = [
+            element.id for element_type, element in session.elements
+            if element_type == 'checkbox' and 'use_image_' in element.id
+        ]
+        for rerun_idx in range(reruns):
+            messages, received = session.messages_received, session.bytes_received
+            start = time.perf_counter()
+            await session.toggle_checkbox(checkbox_ids[rerun_idx % len(checkbox_ids)])
+            latencies.append(time.perf_counter() - start)
+            traffic.append((session.messages_received - messages, session.bytes_received - received))
+    finally:
+        await session.close()
+    return latencies, traffic
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = (len(ordered) - 1) * pct / 100
+    lower = int(index)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+
+def read_process_stats(pid):
+    """الذاكرة المقيمة (بايت) وزمن المعالج (ثانية) لعملية من /proc"""
+    with open(f'/proc/{pid}/statm') as statm:
+        rss = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    with open(f'/proc/{pid}/stat') as stat:
+        fields = stat.read().rsplit(')', 1)[1].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    return rss, cpu_seconds
+
+
+async def sample_process(pid, samples, interval=0.1):
+    while True:
+        try:
+            samples.append(read_process_stats(pid))
+        except (OSError, ValueError, IndexError):
+            pass
+        await asyncio.sleep(interval)
+
+
+async def run_level(base_url, pid, concurrency, sessions, template_bytes, archive_bytes, timeout):
+    """تشغيل عدد من الجلسات بمستوى تزامن محدد وتجميع النتائج"""
+    semaphore = asyncio.Semaphore(concurrency)
+    step_timings = {step: [] for step in STEPS}
+    failures = []
+
+    async def limited_session():
+        async with semaphore:
+            try:
+                timings = await run_session(base_url, template_bytes, archive_bytes, timeout)
+            except Exception as e:
+                failures.append(f"{type(e).__name__}: {e}")
+                return
+            for step, seconds in timings.items():
+                step_timings[step].append(seconds)
+
+    samples = []
+    sampler = asyncio.create_task(sample_process(pid, samples)) if pid else None
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(limited_session() for _ in range(sessions)))
+    wall = time.perf_counter() - wall_start
+    if sampler:
+        sampler.cancel()
+
+    cpu_percent = 0.0
+    peak_rss = 0
+    if len(samples) >= 2:
+        cpu_percent = 100 * (samples[-1][1] - samples[0][1]) / wall
+        peak_rss = max(rss for rss, _ in samples)
+
+    completed = sessions - len(failures)
+    return {
+        'concurrency': concurrency,
+        'sessions': sessions,
+        'completed': completed,
+        'failures': failures,
+        'wall_seconds': wall,
+        'sessions_per_second': completed / wall if wall else 0.0,
+        'server_cpu_percent': cpu_percent,
+        'server_peak_rss_mb': peak_rss / (1024 * 1024),
+        'steps': {
+            step: {
+                'p50': percentile(values, 50),
+                'p90': percentile(values, 90),
+                'p99': percentile(values, 99),
+                'max': max(values) if values else 0.0,
+            }
+            for step, values in step_timings.items()
+        },
+    }
+
+
+def find_saturation(levels, factor):
+    """أول مستوى تزامن تتجاوز فيه p90 للخطوة 3 خط الأساس بمعامل factor،
+    أو تفشل فيه جلسات، أو يتوقف فيه معدل الإنجاز عن الزيادة"""
+    if not levels:
+        return None
+    baseline = levels[0]['steps']['step3_generate']['p90']
+    best_throughput = levels[0]['sessions_per_second']
+    for level in levels[1:]:
+        if level['failures']:
+            return level['concurrency']
+        if baseline and level['steps']['step3_generate']['p90'] > baseline * factor:
+            return level['concurrency']
+        if level['sessions_per_second'] <= best_throughput:
+            return level['concurrency']
+        best_throughput = level['sessions_per_second']
+    return None
+
+
+def print_report(levels, saturation):
+    header = f"{'conc':>5} {'ok':>4} {'sess/s':>7} {'cpu%':>6} {'rss MB':>8}"
+    for step in STEPS:
+        header += f" {step[:5] + ' p50/p90':>17}"
+    print(header)
+    for level in levels:
+        row = (f"{level['concurrency']:>5} {level['completed']:>4} {level['sessions_per_second']:>7.2f} "
+               f"{level['server_cpu_percent']:>6.0f} {level['server_peak_rss_mb']:>8.1f}")
+        for step in STEPS:
+            stats = level['steps'][step]
+            row += f" {stats['p50']:>8.2f}/{stats['p90']:<8.2f}"
+        print(row)
+        for failure in level['failures'][:3]:
+            print(f"      ❌ {failure}")
+    if saturation:
+        print(f"نقطة التشبع: {saturation} جلسة متزامنة")
+    else:
+        print("لم يتم الوصول إلى نقطة التشبع ضمن المستويات المختبرة")
+
+
+async def run_load_test(args, base_url, pid):
+    width, height = (int(v) for v in args.image_size.lower().split('x'))
+    template_bytes = build_synthetic_template(args.template_slides, args.template_pictures)
+    archive_bytes = build_synthetic_archive(args.folders, args.images_per_folder, (width, height))
+
+    # جلسة إحماء لتحميل الوحدات في الخادم قبل القياس
+    await run_session(base_url, template_bytes, archive_bytes, args.timeout)
+
+    levels = []
+    for concurrency in (int(v) for v in args.levels.split(',')):
+        sessions = args.sessions_per_level or concurrency * 2
+        print(f"🔄 تزامن {concurrency}: {sessions} جلسة...", flush=True)
+        levels.append(await run_level(
+            base_url, pid, concurrency, sessions, template_bytes, archive_bytes, args.timeout
+        ))
+    return levels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="اختبار تحميل لجلسات التطبيق المتزامنة")
+    parser.add_argument('--levels', default='1,2,4,8', help="مستويات التزامن مفصولة بفواصل")
+    parser.add_argument('--sessions-per-level', type=int, default=0,
+                        help="عدد الجلسات في كل مستوى (الافتراضي: ضعف مستوى التزامن)")
+    parser.add_argument('--folders', type=int, default=10)
+    parser.add_argument('--images-per-folder', type=int, default=3)
+    parser.add_argument('--image-size', default='1024x768')
+    parser.add_argument('--template-slides', type=int, default=0, help="شرائح إضافية في القالب")
+    parser.add_argument('--template-pictures', type=int, default=1, help="عدد الصور العادية في القالب")
+    parser.add_argument('--step2-reruns', type=int, default=0,
+                        help="قياس زمن إعادة التشغيل في الخطوة 2 فقط بهذا العدد من التغييرات")
+    parser.add_argument('--saturation-factor', type=float, default=2.0)
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--url', help="عنوان خادم محلي قائم بدلاً من تشغيل خادم جديد")
+    parser.add_argument('--server-pid', type=int, help="رقم عملية الخادم القائم لقياس موارده")
+    parser.add_argument('--json', help="حفظ النتائج بصيغة JSON في هذا المسار")
+    args = parser.parse_args(argv)
+
+    server = None
+    store_dir = None
+    try:
+        if args.url:
+            base_url, pid = args.url.rstrip('/'), args.server_pid
+        else:
+            # مخازن منفصلة حتى لا يتأثر أي خادم آخر على نفس الجهاز ولا تُعاد نتائج تشغيل سابق؛
+            # تُحذف كاملة بعد إيقاف الخادم
+            store_dir = tempfile.TemporaryDirectory(prefix='pptx_loadtest_')
+            env = dict(
+                os.environ,
+                PPTX_BLOB_DIR=os.path.join(store_dir.name, 'blobs'),
+                PPTX_RESULT_CACHE_DIR=os.path.join(store_dir.name, 'results'),
+                PPTX_CHECKPOINT_DIR=os.path.join(store_dir.name, 'checkpoints')
+            )
+            server = LocalServer(env=env).start()
+            base_url, pid = server.url, server.pid
+
+        if args.step2_reruns:
+            template_bytes = build_synthetic_template(args.template_slides, args.template_pictures)
+            latencies, traffic = asyncio.run(measure_step2_reruns(
+                base_url, template_bytes, args.step2_reruns, args.timeout
+            ))
+        else:
+            levels = asyncio.run(run_load_test(args, base_url, pid))
+    finally:
+        if server:
+            server.stop()
+        if store_dir:
+            store_dir.cleanup()
+
+    if args.step2_reruns:
+        latencies = latencies[1:] or latencies  # استبعاد أول تغيير (إحماء)
+        messages = sum(m for m, _ in traffic) / len(traffic)
+        kilobytes = sum(b for _, b in traffic) / len(traffic) / 1024
+        print(f"إعادة تشغيل الخطوة 2: p50={percentile(latencies, 50) * 1000:.0f}ms "
+              f"p90={percentile(latencies, 90) * 1000:.0f}ms n={len(latencies)} "
+              f"رسائل/تغيير={messages:.0f} KB/تغيير={kilobytes:.1f}")
+        return 0
+
+    saturation = find_saturation(levels, args.saturation_factor)
+    print_report(levels, saturation)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump({'levels': levels, 'saturation_concurrency': saturation,
+                       'config': vars(args)}, output, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+import os
+import time
+import bisect
+import tempfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# مقاييس تشغيلية بصيغة Prometheus النصية بدون اعتماديات إضافية.
+# التسجيل في الحلقات الساخنة = قفل + عملية جمع (وbisect للمدرجات) فقط.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        registry.register(self)
+
+    def labels(self, **labels):
+        """نسخة من المقياس بقيم تسميات محددة"""
+        return _Child(self, tuple(str(labels[name]) for name in self.labelnames))
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = dict(self._values)
+        if not values and not self.labelnames:
+            values[()] = self._empty()
+        for key, value in sorted(values.items()):
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{self._format_labels(key)} {_format_number(value)}"]
+
+    def _empty(self):
+        return 0
+
+    def snapshot(self):
+        with self._lock:
+            return {key: _copy(value) for key, value in self._values.items()}
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class _Child:
+    def __init__(self, metric, key):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount=1):
+        self._metric._inc(self._key, amount)
+
+    def dec(self, amount=1):
+        self._metric._inc(self._key, -amount)
+
+    def set(self, value):
+        self._metric._set(self._key, value)
+
+    def observe(self, value):
+        self._metric._observe(self._key, value)
+
+    def time(self):
+        return self._metric._time(self._key)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1):
+        self._inc((), amount)
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, snapshot):
+        for key, value in snapshot.items():
+            self._inc(key, value)
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount=1):
+        self._inc((), -amount)
+
+    def set(self, value):
+        self._set((), value)
+
+    def _set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def merge(self, snapshot):
+        """قيم Gauge لحظية خاصة بكل عملية فلا تُدمج"""
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(registry, name, documentation, labelnames)
+
+    def observe(self, value):
+        self._observe((), value)
+
+    def time(self):
+        return self._time(())
+
+    def _empty(self):
+        return [[0] * (len(self.buckets) + 1), 0.0]
+
+    def _observe(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = self._empty()
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def _time(self, key):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._observe(key, time.perf_counter() - started)
+
+    def _render_value(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else _format_number(bound)
+            lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._format_labels(key)} {_format_number(total)}")
+        lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+    def merge(self, snapshot):
+        for key, (counts, total) in snapshot.items():
+            with self._lock:
+                state = self._values.get(key)
+                if state is None:
+                    state = self._values[key] = self._empty()
+                state[0] = [current + added for current, added in zip(state[0], counts)]
+                state[1] += total
+
+
+class Registry:
+    """مجموعة المقاييس في العملية الحالية"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+
+    def render(self):
+        """جميع المقاييس بصيغة Prometheus النصية"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """قيم المقاييس القابلة للجمع لنقلها من عملية منفصلة"""
+        return {name: metric.snapshot() for name, metric in self._metrics.items()
+                if not isinstance(metric, Gauge)}
+
+    def merge(self, snapshot):
+        """إضافة قيم مقاييس عملية أخرى (مثل عمليات التوليد المتوازية)"""
+        for name, values in snapshot.items():
+            if name in self._metrics:
+                self._metrics[name].merge(values)
+
+    def reset(self):
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def write_textfile(self, path):
+        """كتابة المقاييس إلى ملف بشكل ذري (متوافق مع textfile collector في node_exporter)"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        with os.fdopen(fd, 'w', encoding='utf-8') as metrics_file:
+            metrics_file.write(self.render())
+        os.replace(tmp_path, path)
+
+
+def start_http_server(port, address='127.0.0.1', registry=None):
+    """خادم HTTP في thread منفصل يعرض المقاييس على /metrics"""
+    registry = registry or REGISTRY
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True)
+    thread.start()
+    return server
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(value) if not value.is_integer() else str(int(value))
+    return str(value)
+
+
+def _copy(value):
+    if isinstance(value, list):
+        return [list(value[0]), value[1]]
+    return value
+
+
+REGISTRY = Registry()
+
+JOBS_STARTED = Counter(REGISTRY, 'pptx_jobs_started_total', "عمليات التوليد التي بدأت")
+JOBS_COMPLETED = Counter(REGISTRY, 'pptx_jobs_completed_total', "عمليات التوليد المكتملة",
+                         ['source'])
+JOBS_FAILED = Counter(REGISTRY, 'pptx_jobs_failed_total', "عمليات التوليد الفاشلة", ['reason'])
+JOBS_IN_PROGRESS = Gauge(REGISTRY, 'pptx_jobs_in_progress', "عمليات التوليد الجارية حالياً")
+SLIDES_CREATED = Counter(REGISTRY, 'pptx_slides_created_total', "الشرائح المنشأة")
+IMAGES_PROCESSED = Counter(REGISTRY, 'pptx_images_processed_total', "الصور في المجلدات المعالجة")
+IMAGES_PLACED = Counter(REGISTRY, 'pptx_images_placed_total', "الصور المدرجة في الشرائح")
+IMAGES_DOWNSCALED = Counter(REGISTRY, 'pptx_images_downscaled_total', "الصور الكبيرة التي صُغرت قبل إدراجها",
+                            ['method'])
+BYTES_INGESTED = Counter(REGISTRY, 'pptx_bytes_ingested_total', "حجم الملفات المرفوعة", ['kind'])
+BYTES_EMITTED = Counter(REGISTRY, 'pptx_bytes_emitted_total', "حجم العروض الناتجة", ['source'])
+BYTES_RECLAIMED = Counter(REGISTRY, 'pptx_bytes_reclaimed_total', "حجم الوسائط غير المستخدمة المحذوفة قبل الحفظ")
+CACHE_REQUESTS = Counter(REGISTRY, 'pptx_result_cache_requests_total', "طلبات مخزن النتائج",
+                         ['result'])
+STAGE_SECONDS = Histogram(REGISTRY, 'pptx_stage_seconds', "زمن مراحل التوليد بالثواني", ['stage'])
+SLIDE_SECONDS = Histogram(REGISTRY, 'pptx_slide_apply_seconds', "زمن تطبيق الإعدادات على شريحة واحدة",
+                          buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
@@ -0,0 +1,69 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+
+
+class ResultCache:
+    """تخزين العروض المولدة على القرص لإعادتها فوراً عند تكرار نفس العملية"""
+
+    META_FILE = 'meta.json'
+    DECK_FILE = 'deck.pptx'
+
+    def __init__(self, root, ttl_seconds=7 * 24 * 60 * 60):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(self.root, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def deck_path(self, key):
+        return os.path.join(self._entry_dir(key), self.DECK_FILE)
+
+    def get(self, key):
+        """بيانات النتيجة المحفوظة، أو None إن لم توجد"""
+        meta_path = os.path.join(self._entry_dir(key), self.META_FILE)
+        try:
+            with open(meta_path, encoding='utf-8') as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(self.deck_path(key)):
+            return None
+        # تحديث وقت آخر استخدام حتى تبقى النتائج المستخدمة بكثرة
+        os.utime(self._entry_dir(key))
+        return meta
+
+    def put(self, key, meta, fileobj):
+        """حفظ ملف العرض ثم بياناته؛ الكتابة ذرية حتى لا تُقرأ نتيجة ناقصة"""
+        self.sweep()
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+
+        if hasattr(fileobj, 'seek'):
+            fileobj.seek(0)
+        fd, tmp_deck = tempfile.mkstemp(dir=entry_dir, suffix='.part')
+        with os.fdopen(fd, 'wb') as deck_file:
+            shutil.copyfileobj(fileobj, deck_file)
+        os.replace(tmp_deck, self.deck_path(key))
+
+        meta = dict(meta, key=key, created_at=time.time())
+        fd, tmp_meta = tempfile.mkstemp(dir=entry_dir, suffix='.part')
+        with os.fdopen(fd, 'w', encoding='utf-8') as meta_file:
+            json.dump(meta, meta_file, ensure_ascii=False)
+        os.replace(tmp_meta, os.path.join(entry_dir, self.META_FILE))
+
+    def discard(self, key):
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def sweep(self):
+        """حذف النتائج التي لم تُستخدم منذ مدة أطول من ttl_seconds"""
+        cutoff = time.time() - self.ttl_seconds
+        for key in os.listdir(self.root):
+            try:
+                if os.path.getmtime(self._entry_dir(key)) < cutoff:
+                    self.discard(key)
+            except OSError:
+                continue
@@ -0,0 +1,881 @@
+import os
+import io
+import csv
+import json
+import time
+import random
+import zipfile
+import posixpath
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from pptx import Presentation
+from pptx.enum.shapes import PP_PLACEHOLDER, MSO_SHAPE_TYPE
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.parts.slide import BaseSlidePart, SlidePart
+from pptx.oxml.ns import qn
+from lxml import etree
+from PIL import Image
+from PIL.ExifTags import TAGS
+
+import metrics
+from image_decode import MAX_IMAGE_PIXELS, prepare_picture
+
+# منطق توليد الشرائح بدون أي اعتماد على Streamlit حتى يمكن تشغيله في عمليات منفصلة
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp')
+MANIFEST_NAMES = ('manifest.csv', 'manifest.json', 'metadata.csv', 'metadata.json')
+MANIFEST_KEY_COLUMNS = ('folder', 'folder_name', 'المجلد', 'اسم المجلد')
+TEXT_FILL_OPTIONS = ("ترك فارغ", "نص ثابت", "تاريخ", "تاريخ الصورة", "اسم المجلد", "من ملف البيانات")
+RELATIONSHIP_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+# وقت ثابت للناتج الحتمي (SOURCE_DATE_EPOCH كما في أدوات البناء القابلة لإعادة الإنتاج، وإلا 1980-01-01)
+DETERMINISTIC_EPOCH = int(os.environ.get('SOURCE_DATE_EPOCH', 315532800))
+CONTENT_TYPES_MEMBER = '[Content_Types].xml'
+CONTENT_TYPES_NS = 'http://schemas.openxmlformats.org/package/2006/content-types'
+P14_NS = 'http://schemas.microsoft.com/office/powerpoint/2010/main'
+# العلاقات التي يحتاجها تحليل الشريحة الأولى (مواضعها وما ترثه من التخطيط والقالب الرئيسي)
+ANALYSIS_RELATIONSHIPS = {RT.OFFICE_DOCUMENT, RT.SLIDE, RT.SLIDE_LAYOUT, RT.SLIDE_MASTER, RT.THEME}
+# علاقات الوسائط التي تشير إليها عناصر XML صراحة (r:embed، r:link)؛ بدون مرجع تكون ميتة
+MEDIA_RELATIONSHIPS = {RT.IMAGE, RT.MEDIA, RT.VIDEO, RT.AUDIO}
+
+def ignore_detail(message, detail_type="info"):
+    """الافتراضي عند عدم الحاجة لتسجيل التفاصيل"""
+
+def list_folder_images(folder_path):
+    """أسماء ملفات الصور في المجلد (بدون ترتيب)"""
+    return [f for f in os.listdir(folder_path) if f.lower().endswith(IMAGE_EXTENSIONS)]
+
+def analyze_slide_placeholders(prs):
+    """تحليل جميع placeholders في الشريحة الأولى مع ضبط الإحداثيات"""
+    if len(prs.slides) == 0:
+        return None
+    
+    first_slide = prs.slides[0]
+    slide_width = prs.slide_width
+    slide_height = prs.slide_height
+    
+    placeholders = {
+        'image_placeholders': [],
+        'text_placeholders': [],
+        'title_placeholders': [],
+        'slide_dimensions': {
+            'width': slide_width,
+            'height': slide_height,
+            'width_inches': slide_width / 914400,
+            'height_inches': slide_height / 914400
+        }
+    }
+    
+    placeholder_id = 0
+    def clamp_percent(val):
+        # تأكد أن القيمة بين 0 و 100 دائماً
+        return max(0, min(val, 100))
+    
+    for shape in first_slide.shapes:
+        if shape.is_placeholder:
+            placeholder_type = shape.placeholder_format.type
+            left_percent = clamp_percent((shape.left / slide_width) * 100)
+            top_percent = clamp_percent((shape.top / slide_height) * 100)
+            width_percent = clamp_percent((shape.width / slide_width) * 100)
+            height_percent = clamp_percent((shape.height / slide_height) * 100)
+            placeholder_info = {
+                'id': placeholder_id,
+                'type': placeholder_type,
+                'left': shape.left,
+                'top': shape.top,
+                'width': shape.width,
+                'height': shape.height,
+                'left_percent': left_percent,
+                'top_percent': top_percent,
+                'width_percent': width_percent,
+                'height_percent': height_percent,
+                'rotation': getattr(shape, 'rotation', 0)
+            }
+            if placeholder_type == PP_PLACEHOLDER.PICTURE:
+                placeholder_info['current_content'] = "صورة"
+                placeholders['image_placeholders'].append(placeholder_info)
+            elif placeholder_type == PP_PLACEHOLDER.TITLE:
+                placeholder_info['current_content'] = shape.text_frame.text if hasattr(shape, 'text_frame') and shape.text_frame.text else "العنوان"
+                placeholders['title_placeholders'].append(placeholder_info)
+            else:
+                if hasattr(shape, 'text_frame') and shape.text_frame:
+                    placeholder_info['current_content'] = shape.text_frame.text if shape.text_frame.text else f"نص {placeholder_id + 1}"
+                    placeholders['text_placeholders'].append(placeholder_info)
+            placeholder_id += 1
+    for shape in first_slide.shapes:
+        if shape.shape_type == MSO_SHAPE_TYPE.PICTURE and not shape.is_placeholder:
+            left_percent = clamp_percent((shape.left / slide_width) * 100)
+            top_percent = clamp_percent((shape.top / slide_height) * 100)
+            width_percent = clamp_percent((shape.width / slide_width) * 100)
+            height_percent = clamp_percent((shape.height / slide_height) * 100)
+            image_info = {
+                'id': placeholder_id,
+                'type': 'regular_image',
+                'left': shape.left,
+                'top': shape.top,
+                'width': shape.width,
+                'height': shape.height,
+                'left_percent': left_percent,
+                'top_percent': top_percent,
+                'width_percent': width_percent,
+                'height_percent': height_percent,
+                'rotation': getattr(shape, 'rotation', 0),
+                'current_content': "صورة موجودة"
+            }
+            placeholders['image_placeholders'].append(image_info)
+            placeholder_id += 1
+    return placeholders
+
+def extract_archive(zip_ref, target_dir):
+    """استخراج ملف ZIP مع الحفاظ على أوقات تعديل الملفات المسجلة داخله
+    (حتى لا يعتمد "تاريخ الصورة" على وقت الاستخراج)"""
+    for info in zip_ref.infolist():
+        # المسار الذي يُرجعه extract بعد تنقية الاسم (بدون / أو .. في البداية) وليس الاسم الخام،
+        # حتى لا يُعدَّل وقت ملف خارج مجلد الاستخراج
+        path = zip_ref.extract(info, target_dir)
+        if info.is_dir() or not os.path.isfile(path):
+            continue
+        try:
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            os.utime(path, (mtime, mtime))
+        except (OverflowError, ValueError, OSError):
+            continue
+
+def save_presentation(prs, fileobj, deterministic=False, remove_orphans=True):
+    """حفظ العرض وإرجاع (عدد العلاقات الميتة المحذوفة، البايتات المستعادة).
+    
+    في الوضع الحتمي ينتج نفس المدخلات نفس البايتات تماماً: ترتيب ثابت للأجزاء،
+    وأوقات ثابتة في خصائص الملف وفي بيانات ZIP"""
+    orphans = remove_orphaned_media(prs) if remove_orphans else (0, 0)
+    if not deterministic:
+        prs.save(fileobj)
+        return orphans
+    
+    fixed_time = datetime.fromtimestamp(DETERMINISTIC_EPOCH, timezone.utc).replace(tzinfo=None)
+    prs.core_properties.modified = fixed_time
+    if prs.core_properties.created is None:
+        prs.core_properties.created = fixed_time
+    
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    date_time = max(fixed_time.timetuple()[:6], (1980, 1, 1, 0, 0, 0))
+    with zipfile.ZipFile(buffer) as source, \
+            zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as target:
+        # [Content_Types].xml يجب أن يكون أول جزء في الحزمة
+        names = sorted(source.namelist(), key=lambda name: (name != CONTENT_TYPES_MEMBER, name))
+        for name in names:
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            target.writestr(info, source.read(name))
+    return orphans
+
+def remove_orphaned_media(prs):
+    """حذف علاقات الوسائط التي لا يشير إليها أي عنصر في الشرائح والتخطيطات والقوالب الرئيسية
+    (مثل صورة حُذف عنصرها p:pic وبقيت علاقتها)، فلا تُحفظ الوسائط التي لم يعد يستخدمها أي جزء.
+    
+    يُرجع (عدد العلاقات المحذوفة، حجم الأجزاء التي لم تعد في الحزمة بالبايت)"""
+    package = prs.part.package
+    parts = list(package.iter_parts())
+    prefix = '{%s}' % RELATIONSHIP_NS
+    removed = 0
+    for part in parts:
+        if not isinstance(part, BaseSlidePart):
+            continue
+        referenced = {
+            value
+            for element in part._element.iter(etree.Element)
+            for name, value in element.attrib.items()
+            if name.startswith(prefix)
+        }
+        for rId, rel in list(part.rels.items()):
+            if rel.reltype in MEDIA_RELATIONSHIPS and rId not in referenced:
+                part.rels.pop(rId)
+                removed += 1
+    if not removed:
+        return 0, 0
+    
+    # الجزء الذي ما زالت تشير إليه علاقة أخرى (صورة مشتركة) يبقى في الحزمة
+    remaining = set(package.iter_parts())
+    reclaimed = sum(len(part.blob) for part in parts if part not in remaining)
+    metrics.BYTES_RECLAIMED.inc(reclaimed)
+    return removed, reclaimed
+
+def open_template_for_analysis(source):
+    """القالب بالشريحة الأولى وتخطيطها وقالبها الرئيسي فقط؛ يكفي analyze_slide_placeholders
+    ولا يُقرأ شيء من بقية الشرائح أو الوسائط (للتحليل فقط، لا يُحفظ)"""
+    package, _ = _prune_template(source, 1, analysis=True)
+    return Presentation(package)
+
+def open_template(source, include_slides=True):
+    """(العرض، تخطيط الشريحة الأولى) لبدء التوليد، أو (العرض، None) إن لم توجد شرائح.
+    
+    بدون include_slides لا تُقرأ شرائح القالب ولا وسائطها ولا تُنسخ إلى الملف الناتج؛
+    يبقى التخطيط والقالب الرئيسي اللازمان لإنشاء الشرائح الجديدة"""
+    if include_slides:
+        prs = Presentation(source)
+        return prs, prs.slides[0].slide_layout if len(prs.slides) else None
+    
+    package, layout_partname = _prune_template(source, 0)
+    prs = Presentation(package)
+    for master in prs.slide_masters:
+        for layout in master.slide_layouts:
+            if layout.part.partname.lstrip('/') == layout_partname:
+                return prs, layout
+    return prs, None
+
+def _prune_template(source, slide_count, analysis=False):
+    """نسخة من حزمة القالب (BytesIO) بأول slide_count شريحة فقط، مع اسم تخطيط الشريحة الأولى.
+    
+    تُقرأ من ملف ZIP الأجزاء التي يمكن الوصول إليها بعد حذف علاقات بقية الشرائح فقط، فلا
+    تُقرأ تلك الشرائح ولا وسائطها إطلاقاً. مع analysis تُتبع علاقات البنية فقط
+    (ANALYSIS_RELATIONSHIPS) ويبقى تخطيط الشريحة الأولى وقالبها الرئيسي وحدهما."""
+    with zipfile.ZipFile(source) as package:
+        members = set(package.namelist())
+        parsed = {}
+        
+        def load(member):
+            if member not in parsed:
+                parsed[member] = etree.fromstring(package.read(member))
+            return parsed[member]
+        
+        def rels(partname):
+            member = _rels_member(partname)
+            return load(member) if member in members else None
+        
+        def related(partname, reltype):
+            relationships = rels(partname)
+            for rel in relationships if relationships is not None else ():
+                if rel.get('Type') == reltype:
+                    return _rel_target(partname, rel)
+            return None
+        
+        presentation = related('', RT.OFFICE_DOCUMENT)
+        presentation_xml = load(presentation)
+        presentation_rels = rels(presentation)
+        rel_by_id = {rel.get('Id'): rel for rel in presentation_rels}
+        sldIdLst = presentation_xml.find(qn('p:sldIdLst'))
+        slide_ids = list(sldIdLst) if sldIdLst is not None else []
+        
+        first_layout = first_master = None
+        if slide_ids:
+            first_slide = _rel_target(presentation, rel_by_id[slide_ids[0].get(qn('r:id'))])
+            first_layout = related(first_slide, RT.SLIDE_LAYOUT)
+            first_master = related(first_layout, RT.SLIDE_MASTER) if first_layout else None
+        
+        dropped_slides = set()
+        dropped_ids = set()
+        for sldId in slide_ids[slide_count:]:
+            rel = rel_by_id[sldId.get(qn('r:id'))]
+            sldIdLst.remove(sldId)
+            presentation_rels.remove(rel)
+            dropped_slides.add(_rel_target(presentation, rel))
+            dropped_ids.add(sldId.get('id'))
+        if dropped_ids:
+            # العروض المخصصة والأقسام تشير إلى الشرائح المحذوفة
+            custShowLst = presentation_xml.find(qn('p:custShowLst'))
+            if custShowLst is not None:
+                presentation_xml.remove(custShowLst)
+            for sldId in list(presentation_xml.iter('{%s}sldId' % P14_NS)):
+                if sldId.get('id') in dropped_ids:
+                    sldId.getparent().remove(sldId)
+        
+        if analysis and first_master:
+            _keep_listed_part(presentation_xml, 'p:sldMasterIdLst', presentation, presentation_rels, first_master)
+            _keep_listed_part(load(first_master), 'p:sldLayoutIdLst', first_master, rels(first_master), first_layout)
+        
+        # الأجزاء التي يمكن الوصول إليها من جذر الحزمة عبر العلاقات المتبقية
+        reachable = {''}
+        pending = ['']
+        while pending:
+            partname = pending.pop()
+            relationships = rels(partname)
+            if relationships is None:
+                continue
+            for rel in list(relationships):
+                target = _rel_target(partname, rel)
+                if target is None or target in reachable:
+                    continue
+                followed = target in members and not (
+                    analysis and (rel.get('Type') not in ANALYSIS_RELATIONSHIPS or target in dropped_slides)
+                )
+                if followed:
+                    reachable.add(target)
+                    pending.append(target)
+                elif analysis:
+                    relationships.remove(rel)
+        
+        content_types = load(CONTENT_TYPES_MEMBER)
+        for override in list(content_types.iter('{%s}Override' % CONTENT_TYPES_NS)):
+            if override.get('PartName').lstrip('/') not in reachable:
+                content_types.remove(override)
+        
+        output = io.BytesIO()
+        # بدون ضغط: الحزمة تُقرأ مرة واحدة في الذاكرة ثم تُحذف
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as pruned:
+            names = [CONTENT_TYPES_MEMBER] + sorted(reachable - {''})
+            names += [_rels_member(partname) for partname in sorted(reachable) if _rels_member(partname) in members]
+            for name in names:
+                if name in parsed:
+                    pruned.writestr(name, etree.tostring(parsed[name], xml_declaration=True,
+                                                         encoding='UTF-8', standalone=True))
+                else:
+                    pruned.writestr(name, package.read(name))
+    output.seek(0)
+    return output, first_layout
+
+def _rels_member(partname):
+    """اسم ملف العلاقات لجزء داخل الحزمة ('' = جذر الحزمة)"""
+    directory, name = posixpath.split(partname)
+    return posixpath.join(directory, '_rels', name + '.rels')
+
+def _rel_target(partname, rel):
+    """اسم الجزء الذي تشير إليه العلاقة داخل الحزمة، أو None للروابط الخارجية"""
+    if rel.get('TargetMode') == 'External':
+        return None
+    target = rel.get('Target')
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(partname), target))
+
+def _keep_listed_part(part_xml, list_tag, partname, relationships, keep):
+    """إبقاء عنصر واحد فقط في قائمة مثل sldMasterIdLst مع حذف علاقات البقية"""
+    entries = part_xml.find(qn(list_tag))
+    if entries is None:
+        return
+    rel_by_id = {rel.get('Id'): rel for rel in relationships}
+    for entry in list(entries):
+        rel = rel_by_id.get(entry.get(qn('r:id')))
+        if rel is None or _rel_target(partname, rel) != keep:
+            entries.remove(entry)
+            if rel is not None:
+                relationships.remove(rel)
+
+class ImageCache:
+    """نتائج قراءة ومعالجة الصور المشتركة بين عدة قوالب في نفس العملية:
+    قائمة صور المجلد، تاريخ EXIF، والنسخ المصغرة من الصور الكبيرة"""
+    
+    def __init__(self):
+        self._listings = {}
+        self._dates = {}
+        self._pictures = {}
+    
+    def images(self, folder_path):
+        if folder_path not in self._listings:
+            self._listings[folder_path] = sorted(list_folder_images(folder_path))
+        return list(self._listings[folder_path])
+    
+    def image_date(self, image_path):
+        if image_path not in self._dates:
+            self._dates[image_path] = get_image_date(image_path)
+        return self._dates[image_path]
+    
+    def picture(self, image_path):
+        """مثل prepare_picture لكن تُصغر كل صورة مرة واحدة فقط"""
+        if image_path not in self._pictures:
+            picture, note = prepare_picture(image_path)
+            if picture is not image_path:
+                picture = picture.getvalue()
+            self._pictures[image_path] = (picture, note)
+        picture, note = self._pictures[image_path]
+        if isinstance(picture, bytes):
+            return io.BytesIO(picture), note
+        return picture, note
+    
+    def release(self, folder_path):
+        """حذف نتائج المجلد بعد الانتهاء منه في جميع القوالب"""
+        self._listings.pop(folder_path, None)
+        prefix = os.path.join(folder_path, '')
+        for cache in (self._dates, self._pictures):
+            for image_path in [path for path in cache if path.startswith(prefix)]:
+                del cache[image_path]
+
+def get_image_date(image_path):
+    """استخراج تاريخ التقاط الصورة من metadata"""
+    try:
+        try:
+            with Image.open(image_path) as img:
+                if img.format == 'PNG' or img.width * img.height > MAX_IMAGE_PIXELS:
+                    # getexif() يفك ترميز صورة PNG كاملة؛ لها وللصور الضخمة يُقرأ EXIF من رأس الملف فقط
+                    exifdata = Image.Exif()
+                    if img.info.get('exif'):
+                        exifdata.load(img.info['exif'])
+                else:
+                    exifdata = img.getexif()
+                for tag_id in exifdata:
+                    tag = TAGS.get(tag_id, tag_id)
+                    data = exifdata.get(tag_id)
+                    
+                    if tag in ['DateTime', 'DateTimeOriginal', 'DateTimeDigitized']:
+                        try:
+                            date_obj = datetime.strptime(str(data), '%Y:%m:%d %H:%M:%S')
+                            return date_obj.strftime('%Y-%m-%d')
+                        except:
+                            continue
+        except Image.DecompressionBombError:
+            # صورة أكبر من حد Pillow: تاريخ تعديل الملف كما في الصور بدون EXIF
+            pass
+        
+        timestamp = os.path.getmtime(image_path)
+        return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
+    except:
+        return datetime.now().strftime('%Y-%m-%d')
+
+def load_folder_manifest(zip_ref):
+    """قراءة ملف بيانات المجلدات (CSV/JSON) من جذر ملف ZIP مرة واحدة
+    وإرجاع (قاموس {اسم المجلد: {العمود: القيمة}}، اسم الملف) أو (None, None)"""
+    names = {name.lower(): name for name in zip_ref.namelist() if '/' not in name.strip('/')}
+    manifest_name = next((names[name] for name in MANIFEST_NAMES if name in names), None)
+    if manifest_name is None:
+        return None, None
+    
+    return parse_folder_manifest(zip_ref.read(manifest_name), manifest_name), manifest_name
+
+def load_directory_manifest(root):
+    """مثل load_folder_manifest لكن من جذر مجلد على القرص (وضع مراقبة المجلد)"""
+    names = {name.lower(): name for name in os.listdir(root) if os.path.isfile(os.path.join(root, name))}
+    manifest_name = next((names[name] for name in MANIFEST_NAMES if name in names), None)
+    if manifest_name is None:
+        return None, None
+    with open(os.path.join(root, manifest_name), 'rb') as manifest_file:
+        return parse_folder_manifest(manifest_file.read(), manifest_name), manifest_name
+
+def parse_folder_manifest(data, manifest_name):
+    """تحويل محتوى ملف البيانات (CSV/JSON) إلى قاموس {اسم المجلد: {العمود: القيمة}}"""
+    text = data.decode('utf-8-sig')
+    if manifest_name.lower().endswith('.json'):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            # القيم غير القواميس ({"مجلد": 5}) لا تحمل أعمدة فتُتجاهل
+            records = [dict(values, folder=folder) for folder, values in data.items() if isinstance(values, dict)]
+        elif isinstance(data, list):
+            records = data
+        else:
+            raise ValueError("يجب أن يكون ملف JSON قائمة صفوف أو قاموساً {اسم المجلد: {العمود: القيمة}}")
+    else:
+        records = list(csv.DictReader(io.StringIO(text)))
+    
+    manifest = {}
+    for record in records:
+        if not isinstance(record, dict) or not record:
+            continue
+        key_column = next((column for column in MANIFEST_KEY_COLUMNS if column in record), next(iter(record)))
+        folder = str(record.get(key_column) or '').strip().strip('/')
+        if folder:
+            manifest[folder] = {
+                str(column).strip(): '' if value is None else str(value)
+                for column, value in record.items()
+                # csv.DictReader يضع الخلايا الزائدة في صف تحت المفتاح None
+                if column is not None
+            }
+    return manifest
+
+def manifest_columns(manifest):
+    """جميع أسماء الأعمدة الموجودة في ملف البيانات"""
+    columns = set()
+    for values in (manifest or {}).values():
+        columns.update(values)
+    return columns
+
+def parse_config_date(value):
+    """تحويل نص التاريخ (YYYY-MM-DD) إلى date، أو None إن لم يكن تاريخاً"""
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+def rows_to_config(slide_analysis, rows):
+    """تحويل صفوف الجدول إلى نفس بنية placeholders_config المستخدمة في المعالجة"""
+    rows_by_slot = {row.get('slot'): row for row in rows}
+    config = {'images': {}, 'texts': {}}
+    
+    for i, placeholder in enumerate(slide_analysis['image_placeholders']):
+        row = rows_by_slot.get(f"image_{placeholder['id']}") or {}
+        use_image = parse_bool(row.get('use', True))
+        try:
+            order = max(1, int(float(row.get('order') or i+1)))
+        except (TypeError, ValueError):
+            order = i+1
+        config['images'][f"image_{placeholder['id']}"] = {
+            'use': use_image,
+            'order': order if use_image else None,
+            'placeholder_info': placeholder
+        }
+    
+    for placeholder in slide_analysis['text_placeholders']:
+        row = rows_by_slot.get(f"text_{placeholder['id']}") or {}
+        fill = row.get('fill') if row.get('fill') in TEXT_FILL_OPTIONS else TEXT_FILL_OPTIONS[0]
+        if not parse_bool(row.get('use', True)):
+            fill = "ترك فارغ"
+        value = row.get('value')
+        value = None if value is None or str(value) in ('', 'nan', 'None') else str(value)
+        
+        if fill == "نص ثابت":
+            value = value or ""
+        elif fill == "تاريخ":
+            value = value if parse_config_date(value) else "today"
+        elif fill == "تاريخ الصورة":
+            value = "image_date"
+        elif fill == "اسم المجلد":
+            value = "folder_name"
+        elif fill == "من ملف البيانات":
+            value = (value or "").strip()
+        else:
+            value = None
+        config['texts'][f"text_{placeholder['id']}"] = {'type': fill, 'value': value}
+    
+    return config
+
+def parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y', 'نعم')
+    return bool(value)
+
+def import_config_rows(data, file_name):
+    """قراءة ملف إعدادات (json أو csv) وإرجاع الصفوف"""
+    text = data.decode('utf-8-sig')
+    if file_name.lower().endswith('.json'):
+        rows = json.loads(text)
+        if isinstance(rows, dict):
+            rows = rows.get('rows', [])
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+    if not isinstance(rows, list) or not all(isinstance(row, dict) and row.get('slot') for row in rows):
+        raise ValueError("يجب أن يحتوي الملف على صفوف تتضمن العمود slot")
+    return rows
+
+def apply_configured_placeholders(slide, folder_path, folder_name, slide_analysis, placeholders_config, folder_metadata=None, report=ignore_detail, image_files=None, image_cache=None):
+    """تطبيق الإعدادات المحددة على الشريحة"""
+    
+    # الحصول على قائمة الصور في المجلد (بالترتيب المحدد مسبقاً إن وُجد)
+    if image_files is None:
+        imgs = image_cache.images(folder_path) if image_cache else sorted(list_folder_images(folder_path))
+    else:
+        imgs = list(image_files)
+    
+    # تطبيق إعدادات الصور
+    image_config = placeholders_config.get('images', {})
+    
+    # إنشاء قاموس للصور حسب الترتيب المطلوب
+    image_assignments = {}
+    for config_key, config in image_config.items():
+        if config['use'] and config['order'] and config['order'] <= len(imgs):
+            image_path = os.path.join(folder_path, imgs[config['order'] - 1])
+            placeholder_info = config['placeholder_info']
+            
+            # العثور على الشكل المقابل في الشريحة الجديدة
+            target_shapes = []
+            for shape in slide.shapes:
+                if shape.is_placeholder and shape.placeholder_format.type == PP_PLACEHOLDER.PICTURE:
+                    target_shapes.append(shape)
+                elif shape.shape_type == MSO_SHAPE_TYPE.PICTURE and not shape.is_placeholder:
+                    target_shapes.append(shape)
+            
+            # مطابقة الشكل بناءً على الموقع
+            for shape in target_shapes:
+                shape_left_percent = (shape.left / slide_analysis['slide_dimensions']['width']) * 100
+                shape_top_percent = (shape.top / slide_analysis['slide_dimensions']['height']) * 100
+                
+                # تحمل اختلاف بسيط في الموقع
+                if (abs(shape_left_percent - placeholder_info['left_percent']) < 5 and 
+                    abs(shape_top_percent - placeholder_info['top_percent']) < 5):
+                    
+                    try:
+                        # الصور الضخمة تُصغر بذاكرة محدودة قبل إدراجها
+                        if image_cache:
+                            picture, note = image_cache.picture(image_path)
+                        else:
+                            picture, note = prepare_picture(image_path)
+                        if note:
+                            report(note, "warning" if picture is image_path else "info")
+                        
+                        if shape.is_placeholder:
+                            shape.insert_picture(picture)
+                        else:
+                            # استبدال الصورة العادية
+                            original_left = shape.left
+                            original_top = shape.top
+                            original_width = shape.width
+                            original_height = shape.height
+                            
+                            shape_element = shape._element
+                            shape_element.getparent().remove(shape_element)
+                            
+                            slide.shapes.add_picture(picture, original_left, original_top, original_width, original_height)
+                        
+                        metrics.IMAGES_PLACED.inc()
+                        report(f"✅ تم استبدال الصورة {config['order']}: {os.path.basename(image_path)}", "success")
+                        break
+                    except Exception as e:
+                        report(f"❌ فشل في استبدال الصورة: {e}", "error")
+    
+    # تطبيق إعدادات النصوص
+    text_config = placeholders_config.get('texts', {})
+    
+    text_shapes = []
+    for shape in slide.shapes:
+        if (shape.is_placeholder and 
+            shape.placeholder_format.type not in [PP_PLACEHOLDER.PICTURE, PP_PLACEHOLDER.TITLE] and
+            hasattr(shape, 'text_frame') and shape.text_frame):
+            text_shapes.append(shape)
+    
+    text_index = 0
+    for config_key, config in text_config.items():
+        if text_index < len(text_shapes):
+            shape = text_shapes[text_index]
+            
+            try:
+                if config['type'] == "ترك فارغ":
+                    shape.text_frame.text = ""
+                    
+                elif config['type'] == "نص ثابت":
+                    if config['value']:
+                        shape.text_frame.text = config['value']
+                        
+                elif config['type'] == "تاريخ":
+                    if config['value'] == "today":
+                        date_text = datetime.now().strftime('%Y-%m-%d')
+                    else:
+                        date_text = config['value']
+                    shape.text_frame.text = date_text
+                    
+                elif config['type'] == "تاريخ الصورة" and imgs:
+                    first_image_path = os.path.join(folder_path, imgs[0])
+                    image_date = image_cache.image_date(first_image_path) if image_cache else get_image_date(first_image_path)
+                    shape.text_frame.text = image_date
+                    
+                elif config['type'] == "اسم المجلد":
+                    shape.text_frame.text = folder_name
+                    
+                elif config['type'] == "من ملف البيانات":
+                    # بحث في القاموس فقط، دون فتح أي صورة
+                    if folder_metadata is None:
+                        report(f"⚠ لا توجد بيانات للمجلد '{folder_name}' في ملف البيانات", "warning")
+                    shape.text_frame.text = (folder_metadata or {}).get(config['value'], "")
+                
+                report(f"✅ تم تطبيق النص: {config['type']}", "success")
+                
+            except Exception as e:
+                report(f"⚠ خطأ في تطبيق النص: {e}", "warning")
+            
+            text_index += 1
+    
+    # تطبيق العنوان (اسم المجلد)
+    title_shapes = [
+        shape for shape in slide.shapes
+        if shape.is_placeholder and shape.placeholder_format.type == PP_PLACEHOLDER.TITLE
+    ]
+    
+    if title_shapes:
+        title_shapes[0].text = folder_name
+        report(f"✅ تم تحديث العنوان: {folder_name}", "success")
+
+def build_folder_slide(prs, slide_layout, folder_path, slide_analysis, placeholders_config,
+                       image_order_option, folder_metadata, report=ignore_detail, shuffle_seed=None,
+                       image_cache=None):
+    """إنشاء شريحة لمجلد واحد وإرجاع (عدد الشرائح المضافة، عدد الصور).
+    
+    مع shuffle_seed يكون الترتيب العشوائي ثابتاً لكل مجلد بغض النظر عن ترتيب المعالجة،
+    ومع image_cache تُقرأ الصور وتُعالج مرة واحدة لجميع القوالب"""
+    folder_name = os.path.basename(folder_path)
+    created = 0
+    try:
+        # ترتيب الصور في المجلد
+        imgs = image_cache.images(folder_path) if image_cache else sorted(list_folder_images(folder_path))
+        
+        if image_order_option == "عشوائي":
+            if shuffle_seed is None:
+                random.shuffle(imgs)
+            else:
+                random.Random(f"{shuffle_seed}:{folder_name}").shuffle(imgs)
+            report(f"🔀 تم ترتيب صور المجلد {folder_name} عشوائياً", "info")
+        else:
+            report(f"📋 تم ترتيب صور المجلد {folder_name} أبجدياً", "info")
+        
+        # إنشاء شريحة جديدة
+        new_slide = prs.slides.add_slide(slide_layout)
+        created = 1
+        
+        metrics.SLIDES_CREATED.inc()
+        
+        # تطبيق الإعدادات المحددة
+        with metrics.SLIDE_SECONDS.time():
+            apply_configured_placeholders(
+                new_slide,
+                folder_path,
+                folder_name,
+                slide_analysis,
+                placeholders_config,
+                folder_metadata,
+                report,
+                imgs,
+                image_cache
+            )
+        
+        metrics.IMAGES_PROCESSED.inc(len(imgs))
+        report(f"✅ تم إنشاء شريحة للمجلد '{folder_name}' مع {len(imgs)} صورة", "success")
+        return created, len(imgs)
+    
+    except Exception as e:
+        report(f"❌ خطأ في معالجة المجلد {folder_name}: {e}", "error")
+        return created, 0
+
+def _build_slide_chunk(task):
+    """تعمل داخل عملية منفصلة: بناء شرائح مجموعة من المجلدات لكل قالب وحفظ ملف لكل قالب"""
+    # مقاييس هذه المجموعة فقط؛ تُعاد للعملية الرئيسية لتُجمع في مقاييسها
+    metrics.REGISTRY.reset()
+    started = time.perf_counter()
+    
+    builds = []
+    for target in task['targets']:
+        details = []
+        # شرائح القالب لا تدخل في الملف المدمج، فلا داعي لقراءتها ونسخها في كل عملية
+        prs, slide_layout = open_template(target['template_path'], include_slides=False)
+        builds.append({
+            'prs': prs,
+            'slide_layout': slide_layout,
+            'details': details,
+            'report': lambda message, detail_type="info", details=details: details.append((message, detail_type)),
+            'result': {
+                'output_path': target['output_path'],
+                'created_slides': 0,
+                'total_processed': 0,
+                'details': details
+            }
+        })
+    
+    image_cache = ImageCache()
+    for folder_idx, folder_path in enumerate(task['folder_paths'], task['start']):
+        folder_name = os.path.basename(folder_path)
+        folder_metadata = task['manifest'].get(folder_name) if task['manifest'] is not None else {}
+        for target, build in zip(task['targets'], builds):
+            if folder_idx < target['start_folder']:
+                continue
+            created, images = build_folder_slide(
+                build['prs'], build['slide_layout'], folder_path, target['slide_analysis'],
+                target['placeholders_config'], task['image_order_option'], folder_metadata,
+                build['report'], task['shuffle_seed'], image_cache
+            )
+            build['result']['created_slides'] += created
+            build['result']['total_processed'] += images
+        image_cache.release(folder_path)
+    
+    for build in builds:
+        build['prs'].save(build['result']['output_path'])
+    metrics.STAGE_SECONDS.labels(stage='chunk').observe(time.perf_counter() - started)
+    return {
+        'targets': [build['result'] for build in builds],
+        'metrics': metrics.REGISTRY.snapshot()
+    }
+
+def build_slides_parallel(targets, folder_paths, image_order_option, manifest, workers, work_dir,
+                          chunk_size=None, shuffle_seed=None):
+    """توزيع المجلدات على عمليات منفصلة وإرجاع نتائج المجموعات بترتيب المجلدات الأصلي.
+    
+    targets قائمة قوالب، لكل منها template_path وslide_analysis وplaceholders_config
+    وstart_folder (أول مجلد يُبنى له، للاستئناف). كل مجموعة تعالج صورها مرة واحدة لجميع
+    القوالب. كل عنصر ناتج هو (رقم المجلد التالي، نتيجة المجموعة)، وفيها ملف لكل قالب يجب
+    دمجه بالترتيب عبر merge_slides(prs, source, skip=0) قبل حذفه؛ تفتح العمليات القوالب
+    دون شرائحها (انظر open_template) فلا يحتوي الملف إلا الشرائح الجديدة."""
+    first_folder = min(target.get('start_folder', 0) for target in targets)
+    if not chunk_size:
+        # مجموعات أصغر من نصيب كل عملية لتوزيع الحمل بشكل متوازن
+        chunk_size = max(1, -(-(len(folder_paths) - first_folder) // (workers * 4)))
+    
+    tasks = []
+    for chunk_idx, start in enumerate(range(first_folder, len(folder_paths), chunk_size)):
+        chunk = folder_paths[start:start + chunk_size]
+        names = [os.path.basename(path) for path in chunk]
+        tasks.append({
+            'targets': [
+                {
+                    'template_path': target['template_path'],
+                    'slide_analysis': target['slide_analysis'],
+                    'placeholders_config': target['placeholders_config'],
+                    'start_folder': target.get('start_folder', 0),
+                    'output_path': os.path.join(work_dir, f"chunk_{chunk_idx:05d}_{target_idx}.pptx")
+                }
+                for target_idx, target in enumerate(targets)
+            ],
+            'folder_paths': chunk,
+            'start': start,
+            'image_order_option': image_order_option,
+            'shuffle_seed': shuffle_seed,
+            'manifest': None if manifest is None else {name: manifest[name] for name in names if name in manifest},
+            'end': start + len(chunk)
+        })
+    
+    # spawn بدلاً من fork لأن خادم Streamlit يعمل بعدة threads
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = [executor.submit(_build_slide_chunk, task) for task in tasks]
+        try:
+            for task, future in zip(tasks, futures):
+                yield task['end'], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+def merge_slides(prs, source_prs, skip=1):
+    """دمج شرائح source_prs (بعد أول skip شريحة) في نهاية prs على مستوى الحزمة.
+    
+    تُربط الشريحة بنفس أجزاء layout/master الموجودة في prs حسب اسم الجزء، وتُضاف
+    الصور عبر get_or_add_image_part فتُدمج الصور المكررة، وتُحفظ أرقام rId كما هي
+    حتى يكون الناتج مطابقاً للتوليد المتسلسل."""
+    package = prs.part.package
+    parts_by_name = {part.partname: part for part in package.iter_parts()}
+    sldIdLst = prs.slides._sldIdLst
+    
+    for slide in list(source_prs.slides)[skip:]:
+        source_part = slide.part
+        slide_part = SlidePart.load(
+            prs.part._next_slide_partname, source_part.content_type, package, source_part.blob
+        )
+        
+        rId_map = {}
+        for rId, rel in sorted(source_part.rels.items(), key=lambda item: int(item[0][3:])):
+            if rel.is_external:
+                new_rId = slide_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            elif rel.reltype == RT.IMAGE:
+                image_part = package.get_or_add_image_part(io.BytesIO(rel.target_part.blob))
+                new_rId = slide_part.relate_to(image_part, RT.IMAGE)
+            elif rel.target_part.partname in parts_by_name:
+                # layout و master وغيرها من أجزاء القالب المشتركة: لا تُنسخ
+                new_rId = slide_part.relate_to(parts_by_name[rel.target_part.partname], rel.reltype)
+            else:
+                raise ValueError(f"نوع علاقة غير مدعوم في الدمج: {rel.reltype}")
+            rId_map[rId] = new_rId
+        
+        if any(old != new for old, new in rId_map.items()):
+            _remap_relationship_ids(slide_part._element, rId_map)
+        
+        sldIdLst.add_sldId(prs.part.relate_to(slide_part, RT.SLIDE))
+
+def remove_slide(prs, slide_id):
+    """حذف شريحة من العرض؛ أجزاؤها (وصورها غير المشتركة) لا تُحفظ بعد فك ارتباطها"""
+    sldIdLst = prs.slides._sldIdLst
+    for sldId in sldIdLst:
+        if sldId.id == slide_id:
+            sldIdLst.remove(sldId)
+            prs.part.drop_rel(sldId.rId)
+            return True
+    return False
+
+def order_slides(prs, slide_ids):
+    """إعادة ترتيب الشرائح حسب slide_ids (الشرائح غير المذكورة تبقى في البداية بترتيبها)،
+    ثم إعادة ترقيم أجزائها حتى لا تتكرر أسماؤها عند إضافة شرائح بعد الحذف"""
+    sldIdLst = prs.slides._sldIdLst
+    by_id = {sldId.id: sldId for sldId in sldIdLst}
+    for slide_id in slide_ids:
+        sldId = by_id[slide_id]
+        sldIdLst.remove(sldId)
+        sldIdLst.append(sldId)
+    prs.part.rename_slide_parts([sldId.rId for sldId in sldIdLst])
+
+def _remap_relationship_ids(element, rId_map):
+    prefix = '{%s}' % RELATIONSHIP_NS
+    for node in element.iter():
+        for attribute, value in node.attrib.items():
+            if attribute.startswith(prefix) and value in rId_map:
+                node.set(attribute, rId_map[value])
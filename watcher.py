@@ -0,0 +1,311 @@
+"""وضع مراقبة المجلد: تحديث عرض PowerPoint تلقائياً عند إضافة مجلدات صور جديدة.
+
+يراقب السكربت (بدون واجهة) مجلداً مشتركاً تضع فيه فرق الميدان مجلدات الصور،
+وعندما يظهر مجلد جديد أو تتغير صوره تُنتظر مدة --debounce حتى يثبت محتواه
+(انتهاء النسخ)، ثم تُضاف شريحته إلى العرض الناتج أو تُستبدل شريحته القديمة
+فقط دون إعادة توليد بقية الشرائح. القالب والإعدادات نفسها المستخدمة في
+التطبيق: ملف الإعدادات هو ملف JSON/CSV المُصدّر من المحرر الجدولي في الخطوة 2،
+وملف البيانات (manifest.csv/json) يُقرأ من جذر المجلد المراقب إن وُجد.
+
+حالة العرض (بصمة كل مجلد ورقم شريحته) تُحفظ بجانبه في OUTPUT.state.json حتى
+يستأنف السكربت بعد إعادة تشغيله دون إعادة بناء الشرائح المكتملة. يُسجَّل لكل
+حدث زمن الانتظار والمعالجة والحفظ والزمن الكلي منذ اكتشاف التغيير.
+
+مثال:
+    python watcher.py /mnt/field --template template.pptx --config placeholders_config.json \\
+        --output /mnt/reports/field.pptx --debounce 10
+"""
+import os
+import io
+import sys
+import json
+import time
+import signal
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+
+from pptx import Presentation
+
+import metrics
+from slide_engine import (
+    analyze_slide_placeholders, list_folder_images, load_directory_manifest, import_config_rows,
+    rows_to_config, build_folder_slide, remove_slide, order_slides, save_presentation,
+    open_template_for_analysis
+)
+
+logger = logging.getLogger('pptx_watcher')
+
+DETAIL_LEVELS = {'error': logging.ERROR, 'warning': logging.WARNING}
+
+
+def file_digest(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(1024 * 1024), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def folder_signature(folder_path, folder_metadata):
+    """بصمة محتوى المجلد: أسماء الصور وأحجامها وأوقات تعديلها وصفه في ملف البيانات"""
+    entries = []
+    for name in sorted(list_folder_images(folder_path)):
+        stat = os.stat(os.path.join(folder_path, name))
+        entries.append([name, stat.st_size, stat.st_mtime_ns])
+    payload = json.dumps([entries, folder_metadata or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def scan_folders(root, manifest):
+    """{اسم المجلد: (المسار، البصمة)} للمجلدات الفرعية التي تحتوي على صور"""
+    folders = {}
+    for entry in os.scandir(root):
+        if not entry.is_dir() or entry.name.startswith('.'):
+            continue
+        try:
+            if list_folder_images(entry.path):
+                metadata = manifest.get(entry.name) if manifest is not None else {}
+                folders[entry.name] = (entry.path, folder_signature(entry.path, metadata))
+        except OSError:
+            # المجلد حُذف أو نُقل أثناء الفحص؛ سيظهر تغييره في الدورة التالية
+            continue
+    return folders
+
+
+def report_detail(message, detail_type="info"):
+    """تفاصيل بناء الشريحة في السجل (الأخطاء والتحذيرات فقط بالمستوى الافتراضي)"""
+    logger.log(DETAIL_LEVELS.get(detail_type, logging.DEBUG), message)
+
+
+class Debouncer:
+    """تأجيل معالجة المجلد حتى تثبت بصمته مدة debounce ثانية (انتهاء النسخ إليه)"""
+
+    def __init__(self, debounce):
+        self.debounce = debounce
+        self._pending = {}
+
+    def update(self, name, signature, now):
+        """تسجيل البصمة الحالية؛ يُرجع وقت اكتشاف التغيير إن ثبتت البصمة مدة كافية، وإلا None"""
+        pending = self._pending.get(name)
+        if pending is None:
+            self._pending[name] = {'signature': signature, 'detected_at': now, 'changed_at': now}
+            return None
+        if pending['signature'] != signature:
+            pending.update(signature=signature, changed_at=now)
+            return None
+        if now - pending['changed_at'] < self.debounce:
+            return None
+        del self._pending[name]
+        return pending['detected_at']
+
+    def discard(self, name):
+        self._pending.pop(name, None)
+
+    def __len__(self):
+        return len(self._pending)
+
+
+class MaintainedDeck:
+    """العرض الناتج وحالته: شرائح القالب ثم شريحة لكل مجلد بترتيب أسماء المجلدات"""
+
+    def __init__(self, template_path, placeholders_config, output_path, image_order_option,
+                 shuffle_seed=0, deterministic=True):
+        self.template_path = template_path
+        self.placeholders_config = placeholders_config
+        self.output_path = output_path
+        self.state_path = output_path + '.state.json'
+        self.image_order_option = image_order_option
+        self.shuffle_seed = shuffle_seed
+        self.deterministic = deterministic
+        self.job = {
+            'template_hash': file_digest(template_path),
+            'config_hash': hashlib.sha256(json.dumps(
+                placeholders_config, sort_keys=True, ensure_ascii=False, default=str
+            ).encode('utf-8')).hexdigest(),
+            'image_order_option': image_order_option,
+            'shuffle_seed': shuffle_seed
+        }
+        self.prs, self.folders = self._load()
+        self.slide_analysis = analyze_slide_placeholders(open_template_for_analysis(template_path))
+        self.slide_layout = self.prs.slides[0].slide_layout
+
+    def _load(self):
+        """العرض المحفوظ إن كان من نفس القالب والإعدادات ولم يتغير منذ آخر حفظ، وإلا القالب"""
+        try:
+            with open(self.state_path, encoding='utf-8') as state_file:
+                state = json.load(state_file)
+            if (state.get('job') == self.job
+                    and state.get('deck_hash') == file_digest(self.output_path)):
+                logger.info("⏯️ استئناف العرض %s (%d مجلد)", self.output_path, len(state['folders']))
+                return Presentation(self.output_path), state['folders']
+            logger.info("🔄 القالب أو الإعدادات أو العرض تغيرت؛ سيُبنى العرض من جديد")
+        except (OSError, ValueError, KeyError):
+            pass
+        prs = Presentation(self.template_path)
+        if len(prs.slides) == 0:
+            raise ValueError("لا توجد شرائح في ملف PowerPoint")
+        return prs, {}
+
+    def signature(self, name):
+        return self.folders.get(name, {}).get('signature')
+
+    def apply(self, name, folder_path, signature, folder_metadata):
+        """إضافة شريحة المجلد أو استبدال شريحته السابقة؛ يُرجع (added/updated/None، عدد الصور)"""
+        created, images = build_folder_slide(
+            self.prs, self.slide_layout, folder_path, self.slide_analysis, self.placeholders_config,
+            self.image_order_option, folder_metadata, report_detail, self.shuffle_seed
+        )
+        if not created:
+            return None, images
+        previous = self.folders.get(name)
+        if previous:
+            remove_slide(self.prs, previous['slide_id'])
+        self.folders[name] = {'signature': signature, 'slide_id': self.prs.slides[-1].slide_id}
+        return 'updated' if previous else 'added', images
+
+    def remove(self, name):
+        remove_slide(self.prs, self.folders.pop(name)['slide_id'])
+
+    def save(self):
+        """حفظ العرض ثم حالته، كلاهما بشكل ذري"""
+        order_slides(self.prs, [self.folders[name]['slide_id'] for name in sorted(self.folders)])
+        output = io.BytesIO()
+        orphans, reclaimed = save_presentation(self.prs, output, self.deterministic)
+        if orphans:
+            logger.info("🧹 حذف %d علاقة وسائط غير مستخدمة (%d بايت)", orphans, reclaimed)
+        _write_atomic(self.output_path, output.getvalue())
+        state = {
+            'job': self.job,
+            'deck_hash': hashlib.sha256(output.getbuffer()).hexdigest(),
+            'folders': self.folders
+        }
+        _write_atomic(self.state_path, json.dumps(state, ensure_ascii=False, indent=2).encode('utf-8'))
+        metrics.BYTES_EMITTED.labels(source='watch').inc(output.getbuffer().nbytes)
+
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as target:
+            target.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def watch(args, stop_event):
+    with open(args.config, 'rb') as config_file:
+        rows = import_config_rows(config_file.read(), args.config)
+    placeholders_config = rows_to_config(analyze_slide_placeholders(open_template_for_analysis(args.template)), rows)
+    deck = MaintainedDeck(
+        args.template, placeholders_config, args.output,
+        "عشوائي" if args.shuffle else "بالترتيب الأبجدي", args.seed, not args.timestamps
+    )
+    debouncer = Debouncer(args.debounce)
+    # بصمات فشلت معالجتها؛ لا تُعاد المحاولة إلا إذا تغير المجلد
+    failed = {}
+    logger.info("👀 مراقبة %s (debounce=%.1fs، interval=%.1fs)", args.root, args.debounce, args.interval)
+
+    while not stop_event.is_set():
+        cycle_started = time.monotonic()
+        try:
+            manifest, _ = load_directory_manifest(args.root)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            logger.warning("⚠ تعذرت قراءة ملف البيانات: %s", e)
+            manifest = None
+        folders = scan_folders(args.root, manifest)
+        now = time.monotonic()
+
+        ready = []
+        for name in sorted(set(folders) | (set(deck.folders) if args.prune else set())):
+            folder_path, signature = folders.get(name, (None, None))
+            if signature == deck.signature(name) or (name in failed and signature == failed[name]):
+                debouncer.discard(name)
+                continue
+            detected_at = debouncer.update(name, signature, now)
+            if detected_at is not None:
+                ready.append((name, folder_path, signature, detected_at))
+
+        events = []
+        for name, folder_path, signature, detected_at in ready:
+            apply_started = time.monotonic()
+            if folder_path is None:
+                deck.remove(name)
+                action, images = 'removed', 0
+            else:
+                metadata = manifest.get(name) if manifest is not None else {}
+                action, images = deck.apply(name, folder_path, signature, metadata)
+                if action is None:
+                    failed[name] = signature
+                    logger.error("❌ %s: تعذر إنشاء الشريحة؛ ستُعاد المحاولة عند تغير المجلد", name)
+                    continue
+                failed.pop(name, None)
+            apply_seconds = time.monotonic() - apply_started
+            metrics.STAGE_SECONDS.labels(stage='watch_apply').observe(apply_seconds)
+            events.append((name, action, images, detected_at, apply_started, apply_seconds))
+
+        if events:
+            save_started = time.monotonic()
+            deck.save()
+            saved_at = time.monotonic()
+            for name, action, images, detected_at, apply_started, apply_seconds in events:
+                latency = saved_at - detected_at
+                metrics.STAGE_SECONDS.labels(stage='watch_latency').observe(latency)
+                logger.info(
+                    "📝 %s %s images=%d wait_s=%.3f apply_s=%.3f save_s=%.3f latency_s=%.3f",
+                    name, action, images, apply_started - detected_at, apply_seconds,
+                    saved_at - save_started, latency
+                )
+            logger.info("💾 %s: %d شريحة مجلد", args.output, len(deck.folders))
+            if args.metrics_file:
+                metrics.REGISTRY.write_textfile(args.metrics_file)
+
+        if args.once and not len(debouncer):
+            break
+        stop_event.wait(max(0.0, args.interval - (time.monotonic() - cycle_started)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="مراقبة مجلد صور وتحديث عرض PowerPoint تلقائياً")
+    parser.add_argument('root', help="المجلد المراقب (مجلد فرعي لكل شريحة)")
+    parser.add_argument('--template', required=True, help="قالب PowerPoint (.pptx)")
+    parser.add_argument('--config', required=True, help="ملف الإعدادات (JSON/CSV) المُصدّر من الخطوة 2")
+    parser.add_argument('--output', required=True, help="العرض الناتج الذي يُحدّث تدريجياً")
+    parser.add_argument('--debounce', type=float, default=5.0,
+                        help="ثوانٍ يجب أن يبقى فيها المجلد دون تغيير قبل معالجته")
+    parser.add_argument('--interval', type=float, default=1.0, help="الفاصل بين فحوص المجلد بالثواني")
+    parser.add_argument('--shuffle', action='store_true', help="ترتيب عشوائي للصور (ببذرة ثابتة)")
+    parser.add_argument('--seed', type=int, default=0, help="بذرة الترتيب العشوائي")
+    parser.add_argument('--prune', action='store_true', help="حذف شرائح المجلدات المحذوفة من المجلد المراقب")
+    parser.add_argument('--timestamps', action='store_true',
+                        help="حفظ أوقات التعديل الفعلية بدلاً من الحفظ الحتمي")
+    parser.add_argument('--once', action='store_true', help="معالجة المحتوى الحالي ثم الخروج")
+    parser.add_argument('--metrics-port', type=int, help="عرض المقاييس على http://ADDRESS:PORT/metrics")
+    parser.add_argument('--metrics-address', default='127.0.0.1')
+    parser.add_argument('--metrics-file', help="كتابة المقاييس إلى ملف بعد كل تحديث")
+    parser.add_argument('--verbose', action='store_true', help="تسجيل تفاصيل بناء كل شريحة")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format='%(asctime)s %(levelname)s %(message)s')
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port, args.metrics_address)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    try:
+        watch(args, stop_event)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())